@@ -0,0 +1,136 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+
+TOKEN_KEY = 'token_auth:{}'
+GENERATION_KEY = 'token_auth:user:{}'
+# Поля пользователя в записи кэша в порядке модели (его ждет
+# Model.from_db); остальные, в том числе пароль, загружаются из базы
+# данных при первом обращении.
+USER_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname in ('id', 'username', 'email', 'first_name',
+                         'last_name', 'is_active', 'is_staff',
+                         'is_superuser'))
+# Изменение этих полей сбрасывает кэш токенов пользователя.
+RESET_FIELDS = frozenset(USER_FIELDS) | {'password'}
+
+
+def shared_key(key):
+    """Ключ общего кэша: сам токен в кэше не хранится."""
+    return TOKEN_KEY.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+def get_generation(user_id):
+    """Поколение токенов пользователя в общем кэше."""
+    key = GENERATION_KEY.format(user_id)
+    generation = cache.get(key)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        if not cache.add(key, generation, None):
+            generation = cache.get(key, generation)
+    return generation
+
+
+def restore(key, user_id, values, created):
+    """Токен и пользователь из записи кэша без запроса к БД."""
+    db = router.db_for_write(User)
+    user = User.from_db(db, USER_FIELDS, values)
+    token = Token.from_db(db, ('key', 'user_id', 'created'),
+                          (key, user_id, created))
+    token.user = user
+    return token
+
+
+class TokenCache:
+    """Кэш токенов с данными пользователей.
+
+    Первый уровень - LRU в памяти процесса (TOKEN_CACHE_SIZE записей,
+    TOKEN_CACHE_TTL секунд). При TOKEN_CACHE_SHARED второй уровень -
+    кэш Django, общий для процессов gunicorn. Запись хранит только
+    поля USER_FIELDS и поколение токенов пользователя; поколение
+    сверяется с общим кэшем при каждом обращении, поэтому выход,
+    смена пароля или прав в одном процессе действуют во всех.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry, expires = entry
+                if expires > time.monotonic():
+                    self.entries.move_to_end(key)
+                else:
+                    del self.entries[key]
+                    entry = None
+        shared = entry is None
+        if shared and settings.TOKEN_CACHE_SHARED:
+            entry = cache.get(shared_key(key))
+        if entry is None:
+            return None
+        generation, user_id, values, created = entry
+        if generation != get_generation(user_id):
+            self.discard(key)
+            return None
+        if shared:
+            self.store(key, entry)
+        return restore(key, user_id, values, created)
+
+    def set(self, key, token):
+        entry = (get_generation(token.user_id), token.user_id,
+                 tuple(getattr(token.user, field) for field in USER_FIELDS),
+                 token.created)
+        self.store(key, entry)
+        if settings.TOKEN_CACHE_SHARED:
+            cache.set(shared_key(key), entry, settings.TOKEN_CACHE_TTL)
+
+    def store(self, key, entry):
+        if settings.TOKEN_CACHE_SIZE <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (
+                entry, time.monotonic() + settings.TOKEN_CACHE_TTL)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def discard(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def invalidate(self, user_id):
+        """Сбрасывает все токены пользователя во всех процессах."""
+        with self.lock:
+            for key, ((_, entry_user_id, _, _), _) in list(
+                    self.entries.items()):
+                if entry_user_id == user_id:
+                    del self.entries[key]
+        cache.set(GENERATION_KEY.format(user_id), uuid.uuid4().hex, None)
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД для известных токенов."""
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            _, token = super().authenticate_credentials(key)
+            token_cache.set(key, token)
+        return token.user, token
@@ -0,0 +1,282 @@
+import io
+import os
+import random
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+BASELINE = os.path.join(settings.BASE_DIR, 'data', 'benchmark_baseline.json')
+PASSWORD = 'benchmark-Pa55word'
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJ'
+         'AAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+
+# Шаг сценария: ключ в базовой линии, имя маршрута, метод, путь
+# (шаблон str.format по состоянию), клиент, тело запроса, ожидаемый статус
+# и ключ состояния, в который сохраняется поле ответа.
+Step = namedtuple(
+    'Step', 'key route method path client data status store',
+    defaults=(None, 200, None))
+
+SCENARIOS = (
+    (Step('api-root', 'api-root', 'get', '/api/', 'anon'),),
+    (Step('metrics', 'metrics', 'get', '/api/metrics/', 'staff'),),
+    (Step('users-list', 'users-list', 'get', '/api/users/', 'anon'),),
+    (Step('users-list:auth', 'users-list', 'get', '/api/users/', 'user'),),
+    (Step('users-detail', 'users-detail', 'get', '/api/users/{author}/',
+          'anon'),),
+    (Step('users-detail:auth', 'users-detail', 'get',
+          '/api/users/{author}/', 'user'),),
+    (Step('users-me', 'users-me', 'get', '/api/users/me/', 'user'),),
+    (Step('users-subscriptions', 'users-subscriptions', 'get',
+          '/api/users/subscriptions/?recipes_limit=3', 'user'),),
+    (Step('users-subscribe:post', 'users-subscribe', 'post',
+          '/api/users/{free_author}/subscribe/', 'user', status=201),
+     Step('users-subscribe:delete', 'users-subscribe', 'delete',
+          '/api/users/{free_author}/subscribe/', 'user', status=204)),
+    (Step('users-list:post', 'users-list', 'post', '/api/users/', 'anon',
+          data=lambda state: {
+              'email': f'new{state["counter"]}@benchmark.ru',
+              'username': f'new{state["counter"]}',
+              'first_name': 'Новый', 'last_name': 'Пользователь',
+              'password': PASSWORD},
+          status=201),),
+    (Step('login', 'login', 'post', '/api/auth/token/login/', 'anon',
+          data=lambda state: {'email': state['email'],
+                              'password': PASSWORD},
+          store=('login_token', 'auth_token')),
+     Step('logout', 'logout', 'post', '/api/auth/token/logout/', 'login',
+          status=204)),
+    (Step('ingredients-list', 'ingredients-list', 'get',
+          '/api/ingredients/', 'anon'),),
+    (Step('ingredients-list:stream', 'ingredients-list', 'get',
+          '/api/ingredients/?stream=1', 'anon'),),
+    (Step('ingredients-list:search', 'ingredients-list', 'get',
+          '/api/ingredients/?name=ингредиент 1', 'anon'),),
+    (Step('ingredients-detail', 'ingredients-detail', 'get',
+          '/api/ingredients/{ingredient}/', 'anon'),),
+    (Step('tags-list', 'tags-list', 'get', '/api/tags/', 'anon'),),
+    (Step('tags-detail', 'tags-detail', 'get', '/api/tags/{tag}/',
+          'anon'),),
+    (Step('recipes-list', 'recipes-list', 'get', '/api/recipes/', 'anon'),),
+    (Step('recipes-list:auth', 'recipes-list', 'get', '/api/recipes/',
+          'user'),),
+    (Step('recipes-list:filters', 'recipes-list', 'get',
+          '/api/recipes/?tags={tag_slug}&tags=tag1&author={author}',
+          'user'),),
+    (Step('recipes-list:search', 'recipes-list', 'get',
+          '/api/recipes/?search=Рецепт 1', 'user'),),
+    (Step('recipes-list:favorited', 'recipes-list', 'get',
+          '/api/recipes/?is_favorited=1', 'user'),),
+    (Step('recipes-list:in-cart', 'recipes-list', 'get',
+          '/api/recipes/?is_in_shopping_cart=1', 'user'),),
+    (Step('recipes-list:deep-page', 'recipes-list', 'get',
+          '/api/recipes/?page={last_page}', 'anon'),),
+    (Step('recipes-list:cursor', 'recipes-list', 'get',
+          '/api/recipes/?pagination=cursor', 'anon'),),
+    (Step('recipes-detail', 'recipes-detail', 'get',
+          '/api/recipes/{recipe}/', 'anon'),),
+    (Step('recipes-detail:auth', 'recipes-detail', 'get',
+          '/api/recipes/{recipe}/', 'user'),),
+    (Step('recipes-list:post', 'recipes-list', 'post', '/api/recipes/',
+          'user', data=lambda state: {
+              'ingredients': [{'id': pk, 'amount': 10}
+                              for pk in state['ingredients'][:10]],
+              'tags': [state['tag']], 'image': IMAGE,
+              'name': 'Новый рецепт', 'text': 'Описание',
+              'cooking_time': 10},
+          status=201, store=('new_recipe', 'id')),
+     Step('recipes-detail:patch', 'recipes-detail', 'patch',
+          '/api/recipes/{new_recipe}/', 'user', data=lambda state: {
+              'ingredients': [{'id': pk, 'amount': 20}
+                              for pk in state['ingredients'][5:15]],
+              'tags': [state['tag']], 'image': IMAGE,
+              'name': 'Измененный рецепт', 'text': 'Описание',
+              'cooking_time': 20}),
+     Step('recipes-detail:delete', 'recipes-detail', 'delete',
+          '/api/recipes/{new_recipe}/', 'user', status=204)),
+    (Step('recipes-favorite:post', 'recipes-favorite', 'post',
+          '/api/recipes/{free_recipe}/favorite/', 'user', status=201),
+     Step('recipes-favorite:delete', 'recipes-favorite', 'delete',
+          '/api/recipes/{free_recipe}/favorite/', 'user', status=204)),
+    (Step('recipes-shopping-cart:post', 'recipes-shopping-cart', 'post',
+          '/api/recipes/{free_recipe}/shopping_cart/', 'user', status=201),
+     Step('recipes-shopping-cart:delete', 'recipes-shopping-cart', 'delete',
+          '/api/recipes/{free_recipe}/shopping_cart/', 'user',
+          status=204)),
+    (Step('recipes-favorite-bulk:post', 'recipes-favorite-bulk', 'post',
+          '/api/recipes/favorite/', 'user',
+          data=lambda state: {'recipes': [state['free_recipe']]}),
+     Step('recipes-favorite-bulk:delete', 'recipes-favorite-bulk', 'delete',
+          '/api/recipes/favorite/', 'user',
+          data=lambda state: {'recipes': [state['free_recipe']]})),
+    (Step('recipes-shopping-cart-bulk:post', 'recipes-shopping-cart-bulk',
+          'post', '/api/recipes/shopping_cart/', 'user',
+          data=lambda state: {'recipes': [state['free_recipe']]}),
+     Step('recipes-shopping-cart-bulk:delete', 'recipes-shopping-cart-bulk',
+          'delete', '/api/recipes/shopping_cart/', 'user',
+          data=lambda state: {'recipes': [state['free_recipe']]})),
+    (Step('recipes-feed', 'recipes-feed', 'get', '/api/recipes/feed/',
+          'user'),),
+    (Step('recipes-shopping-list', 'recipes-shopping-list', 'get',
+          '/api/recipes/shopping_list/', 'user'),),
+    (Step('recipes-download-shopping-cart', 'recipes-download-shopping-cart',
+          'get', '/api/recipes/download_shopping_cart/', 'user'),),
+    (Step('recipes-download-shopping-cart:json',
+          'recipes-download-shopping-cart', 'get',
+          '/api/recipes/download_shopping_cart/?format=json', 'user'),),
+)
+
+# Маршруты, которые не измеряются: они отправляют письма или меняют
+# учетные данные пользователя.
+SKIPPED = {
+    'users-activation', 'users-resend-activation', 'users-reset-password',
+    'users-reset-password-confirm', 'users-reset-username',
+    'users-reset-username-confirm', 'users-set-password',
+    'users-set-username',
+}
+
+
+def reachable_routes():
+    """Имена маршрутов api.urls, не перекрытых ранее объявленными."""
+    seen, names = set(), set()
+
+    def walk(patterns, prefix=''):
+        for pattern in patterns:
+            regex = prefix + str(pattern.pattern)
+            if isinstance(pattern, URLResolver):
+                walk(pattern.url_patterns, regex)
+            elif regex not in seen:
+                seen.add(regex)
+                names.add(pattern.name)
+
+    walk(get_resolver('api.urls').url_patterns)
+    return names
+
+
+def seed(users, recipes, ingredients, favorites, carts, subscriptions):
+    """Заполняет базу данных; возвращает состояние для путей сценариев."""
+    rng = random.Random(0)
+    password = make_password(PASSWORD)
+    User.objects.bulk_create(
+        User(username=f'user{i}', email=f'user{i}@benchmark.ru',
+             first_name='Имя', last_name='Фамилия', password=password)
+        for i in range(max(users, 3)))
+    users = list(User.objects.order_by('pk'))
+    Tag.objects.bulk_create(
+        Tag(name=f'Тег {i}', color=f'#00000{i}', slug=f'tag{i}')
+        for i in range(3))
+    tags = list(Tag.objects.order_by('pk'))
+    Ingredient.objects.bulk_create(
+        Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+        for i in range(max(ingredients, 20)))
+    ingredients = list(Ingredient.objects.order_by('pk'))
+    Recipe.objects.bulk_create(
+        Recipe(author=users[1 + i % (len(users) - 1)],
+               name=f'Рецепт {i}', text='Описание рецепта',
+               cooking_time=1 + i % 60, image='recipes/benchmark.png')
+        for i in range(max(recipes, 2)))
+    recipes = list(Recipe.objects.order_by('pk'))
+    Recipe.tags.through.objects.bulk_create(
+        Recipe.tags.through(recipe=recipe, tag=tag)
+        for recipe in recipes
+        for tag in rng.sample(tags, rng.randint(1, len(tags))))
+    RecipeIngredients.objects.bulk_create(
+        RecipeIngredients(recipe=recipe, ingredient=ingredient,
+                          amount=rng.randint(1, 500))
+        for recipe in recipes
+        for ingredient in rng.sample(ingredients, 8))
+    user = users[0]
+    free_recipe, free_author = recipes[0], users[-1]
+
+    def pairs(count, first, second, skip):
+        found = set()
+        for _ in range(count * 3):
+            if len(found) >= count:
+                break
+            pair = (rng.choice(first), rng.choice(second))
+            if not skip(pair):
+                found.add(pair)
+        return found
+
+    def taken(pair):
+        return pair == (user, free_recipe)
+
+    Favorite.objects.bulk_create(
+        Favorite(user=who, recipe=what)
+        for who, what in pairs(favorites, users, recipes, taken))
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user=who, recipe=what)
+        for who, what in pairs(carts, users, recipes, taken))
+    Subscription.objects.bulk_create(
+        Subscription(user=who, author=whom)
+        for who, whom in pairs(
+            subscriptions, users, users,
+            lambda pair: pair[0] == pair[1] or pair == (user,
+                                                        free_author)))
+    call_command('recount_counters', stdout=io.StringIO())
+    call_command('rebuild_feed', stdout=io.StringIO())
+    call_command('rebuild_shopping_lists', stdout=io.StringIO())
+    staff = User.objects.create(
+        username='staff', email='staff@benchmark.ru', first_name='Имя',
+        last_name='Фамилия', password=password, is_staff=True)
+    return {
+        'token': Token.objects.create(user=user).key,
+        'staff_token': Token.objects.create(user=staff).key,
+        'email': users[2].email,
+        'author': users[1].pk,
+        'free_author': free_author.pk,
+        'recipe': recipes[-1].pk,
+        'free_recipe': free_recipe.pk,
+        'ingredient': ingredients[0].pk,
+        'ingredients': [ingredient.pk for ingredient in ingredients],
+        'tag': tags[0].pk,
+        'tag_slug': tags[0].slug,
+        'last_page': (len(recipes) - 1) // settings.REST_FRAMEWORK[
+            'PAGE_SIZE'] + 1,
+        'counter': 0,
+    }
+
+
+def get_client(name, state):
+    client = APIClient()
+    if name == 'user':
+        client.credentials(HTTP_AUTHORIZATION=f'Token {state["token"]}')
+    elif name == 'staff':
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {state["staff_token"]}')
+    elif name == 'login':
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {state["login_token"]}')
+    return client
+
+
+# Ответ шага сценария: путь, статус, тело, число SQL-запросов и время, мс.
+Result = namedtuple('Result', 'path status content queries elapsed')
+
+
+def perform(step, state):
+    """Выполняет шаг сценария и сохраняет поле ответа в state."""
+    client = get_client(step.client, state)
+    data = step.data(state) if step.data else None
+    path = step.path.format(**state)
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as queries:
+        response = getattr(client, step.method)(path, data, format='json')
+        content = (b''.join(response.streaming_content)
+                   if response.streaming else response.content)
+    elapsed = (time.perf_counter() - start) * 1000
+    if step.store and response.status_code == step.status:
+        state[step.store[0]] = response.json()[step.store[1]]
+    return Result(path, response.status_code, content, len(queries), elapsed)
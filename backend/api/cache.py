@@ -0,0 +1,144 @@
+import hashlib
+import time
+import uuid
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import http_date, parse_http_date_safe
+
+from api.metrics import registry
+
+VERSION_KEY = 'reference_version:{}'
+
+
+# Версии моделей в памяти процесса на случай недоступного общего кэша.
+local_versions = {}
+
+
+def get_version(model):
+    """Текущая версия данных модели: токен и время последнего изменения.
+
+    Если общий кэш не отвечает (PyMemcacheCache с ignore_exc возвращает
+    промах на get и False на add), используется версия процесса: она
+    меняется только bump_version в этом процессе, а индекс ингредиентов
+    тогда обновляется по INGREDIENT_INDEX_TTL.
+    """
+    label = model._meta.label_lower
+    key = VERSION_KEY.format(label)
+    version = cache.get(key)
+    if version is None:
+        version = (uuid.uuid4().hex, int(time.time()))
+        if not cache.add(key, version, None):
+            version = cache.get(key)
+    if version is None:
+        return local_versions.setdefault(
+            label, (uuid.uuid4().hex, int(time.time())))
+    return version
+
+
+def bump_version(model):
+    label = model._meta.label_lower
+    version = (uuid.uuid4().hex, int(time.time()))
+    local_versions[label] = version
+    cache.set(VERSION_KEY.format(label), version, None)
+
+
+def normalize_query(params):
+    """Параметры запроса без пустых значений в постоянном порядке."""
+    return urlencode(sorted(
+        (key, sorted(value for value in values if value))
+        for key, values in params.lists()
+        if any(values)
+    ), doseq=True)
+
+
+class ReferenceCacheMixin:
+    """Кэширование готовых ответов для редко меняющихся справочников.
+
+    Ответ хранится в кэше уже отрендеренным вместе со строгим ETag.
+    Ключ включает версию данных модели, которая меняется сигналами
+    при сохранении и удалении объектов, поэтому устаревшие записи
+    просто перестают использоваться. Повторный запрос с If-None-Match
+    или If-Modified-Since получает 304 без обращения к базе данных.
+    Кэшируются только анонимные запросы: ответ авторизованному
+    пользователю зависит от его подписок, избранного и корзины.
+    """
+    cache_timeout = 60 * 60 * 24
+    cache_key = None
+
+    def get_cache_key(self, request):
+        token, _ = get_version(self.queryset.model)
+        params = normalize_query(request.query_params)
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        signature = hashlib.md5(
+            f'{request.accepted_renderer.format}:{lookup}:{params}'.encode()
+        ).hexdigest()
+        return f'reference:{self.basename}:{token}:{signature}'
+
+    def get_cached_response(self, request):
+        if not request.user.is_anonymous:
+            return None
+        _, last_modified = get_version(self.queryset.model)
+        self.cache_key = self.get_cache_key(request)
+        cached = cache.get(self.cache_key)
+        stats_name = self.queryset.model._meta.model_name
+        if cached is None:
+            registry.count_cache(stats_name, 'miss')
+            return None
+        registry.count_cache(stats_name, 'hit')
+        etag, content_type, content = cached
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if if_none_match is not None:
+            not_modified = etag in if_none_match or if_none_match == '*'
+        else:
+            not_modified = (if_modified_since is not None
+                            and last_modified <= if_modified_since)
+        if not_modified:
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return (self.get_cached_response(request)
+                or super().list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return (self.get_cached_response(request)
+                or super().retrieve(request, *args, **kwargs))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        if (self.cache_key is not None
+                and request.method == 'GET'
+                and response.status_code == 200
+                and not response.has_header('ETag')):
+            response.render()
+            etag = '"{}"'.format(hashlib.md5(response.content).hexdigest())
+            _, last_modified = get_version(self.queryset.model)
+            cache.set(self.cache_key,
+                      (etag, response['Content-Type'], response.content),
+                      self.cache_timeout)
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            response['X-Cache'] = 'MISS'
+        return response
+
+
+class RecipeCacheMixin(ReferenceCacheMixin):
+    """Кэш анонимных ответов со списком и карточками рецептов.
+
+    Версия рецептов меняется при любом изменении рецептов, их
+    ингредиентов и тегов. Счетчики избранного и картинки обновляются
+    запросами в обход сигналов, поэтому срок жизни записи короткий
+    (RECIPE_CACHE_TIMEOUT) и ограничивает их отставание.
+    """
+    cache_timeout = settings.RECIPE_CACHE_TIMEOUT
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.files.storage import default_storage
+from drf_extra_fields.fields import Base64ImageField
+from rest_framework import serializers
+
+
+class LimitedBase64ImageField(Base64ImageField):
+    """Base64ImageField с ограничением размера до декодирования."""
+
+    def to_internal_value(self, base64_data):
+        if (isinstance(base64_data, str)
+                and len(base64_data) * 3 // 4 > settings.MAX_IMAGE_SIZE):
+            raise serializers.ValidationError(
+                'Размер изображения не должен превышать '
+                f'{settings.MAX_IMAGE_SIZE // (1024 * 1024)} МБ.')
+        return super().to_internal_value(base64_data)
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Ссылки на уменьшенные копии картинки рецепта."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('source', 'image_variants')
+        super().__init__(**kwargs)
+
+    def to_representation(self, variants):
+        request = self.context.get('request')
+        urls = {}
+        for variant, files in variants.items():
+            if variant == 'source':
+                continue
+            urls[variant] = {}
+            for extension, name in files.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[variant][extension] = url
+        return urls
@@ -1,7 +1,20 @@
 import django_filters
+from django import forms
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart
+
+
+class SlugListField(forms.MultipleChoiceField):
+    """Список слагов без загрузки всех вариантов из базы данных."""
+
+    def valid_value(self, value):
+        return True
+
+
+class SlugListFilter(filters.MultipleChoiceFilter):
+    field_class = SlugListField
 
 
 class IngredientsFilter(FilterSet):
@@ -14,29 +27,38 @@ class IngredientsFilter(FilterSet):
 
 
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all()
-    )
+    author = filters.NumberFilter(field_name='author_id')
+    tags = SlugListFilter(method='get_tags_filter')
     is_favorited = filters.BooleanFilter(
         method='get_favorited_filter')
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_shopping_cart_filter')
+    search = filters.CharFilter(method='get_search_filter')
+
+    def get_tags_filter(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe_id=OuterRef('pk'), tag__slug__in=value)))
 
     def get_favorited_filter(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(favorites__user=user)
+            return queryset.filter(Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))))
         return queryset
 
     def get_shopping_cart_filter(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
-            return queryset.filter(shopping_cart__user=user)
+            return queryset.filter(Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))))
         return queryset
 
+    def get_search_filter(self, queryset, name, value):
+        return queryset.search(value)
+
     class Meta:
         model = Recipe
         fields = ('author', 'tags', 'is_favorited',
-                  'is_in_shopping_cart')
+                  'is_in_shopping_cart', 'search')
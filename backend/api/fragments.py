@@ -0,0 +1,44 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+FRAGMENT_KEY = 'recipe_fragment:{}:{}'
+VERSION_KEY = 'recipe_fragment_version:{}'
+
+
+def get_versions(recipe_ids):
+    """Версии фрагментов рецептов; недостающие создаются заново."""
+    keys = {VERSION_KEY.format(pk): pk for pk in recipe_ids}
+    found = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, settings.RECIPE_FRAGMENT_TIMEOUT)
+        found.update(missing)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def get_fragments(versions):
+    keys = {FRAGMENT_KEY.format(pk, version): pk
+            for pk, version in versions.items()}
+    return {keys[key]: fragment
+            for key, fragment in cache.get_many(keys).items()}
+
+
+def set_fragments(versions, fragments):
+    cache.set_many({
+        FRAGMENT_KEY.format(pk, versions[pk]): fragment
+        for pk, fragment in fragments.items()
+    }, settings.RECIPE_FRAGMENT_TIMEOUT)
+
+
+def invalidate(recipe_ids):
+    """Сбрасывает версии фрагментов после коммита.
+
+    Запрос, прочитавший версию до коммита, сохранит старые данные под
+    старой версией, и их больше никто не прочитает.
+    """
+    keys = [VERSION_KEY.format(pk) for pk in recipe_ids]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,68 @@
+from django.db import models
+from rest_framework import serializers
+
+from recipes.models import Favorite, ShoppingCart
+from users.models import Subscription
+
+RELATIONS = {
+    'subscriptions': (Subscription, 'author_id'),
+    'favorites': (Favorite, 'recipe_id'),
+    'shopping_cart': (ShoppingCart, 'recipe_id'),
+}
+
+
+class RelationLoader:
+    """Связи текущего пользователя в рамках одного запроса.
+
+    Сериализаторы регистрируют идентификаторы всех выводимых объектов,
+    а при первом обращении к связи загружаются все накопленные
+    идентификаторы одним запросом на каждую связь.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.pending = {relation: set() for relation in RELATIONS}
+        self.known = {relation: set() for relation in RELATIONS}
+        self.found = {relation: set() for relation in RELATIONS}
+
+    def prime(self, relation, ids):
+        self.pending[relation].update(
+            pk for pk in ids if pk not in self.known[relation])
+
+    def has(self, relation, pk):
+        if pk not in self.known[relation]:
+            self.pending[relation].add(pk)
+            self.load(relation)
+        return pk in self.found[relation]
+
+    def load(self, relation):
+        ids = self.pending[relation]
+        model, field = RELATIONS[relation]
+        self.found[relation].update(model.objects.filter(
+            user=self.user, **{f'{field}__in': ids}
+        ).values_list(field, flat=True))
+        self.known[relation].update(ids)
+        self.pending[relation] = set()
+
+
+def get_loader(context):
+    """Загрузчик связей, общий для всех сериализаторов запроса."""
+    request = context.get('request')
+    if request is None or not request.user.is_authenticated:
+        return None
+    loader = getattr(request, '_relation_loader', None)
+    if loader is None:
+        loader = request._relation_loader = RelationLoader(request.user)
+    return loader
+
+
+class PrimingListSerializer(serializers.ListSerializer):
+    """Передает загрузчику связей все объекты списка до сериализации."""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        iterable = list(iterable)
+        loader = get_loader(self.context)
+        if loader is not None:
+            self.child.prime(loader, iterable)
+        return super().to_representation(iterable)
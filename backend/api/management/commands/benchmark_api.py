@@ -0,0 +1,175 @@
+import json
+import os
+import statistics
+import tempfile
+import uuid
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+
+from api.benchmark import (BASELINE, SCENARIOS, SKIPPED, perform,
+                           reachable_routes, seed)
+
+
+def percentile(samples, percent):
+    if len(samples) < 2:
+        return samples[0]
+    return statistics.quantiles(samples, n=100)[percent - 1]
+
+
+class Command(BaseCommand):
+    help = ('Замер числа SQL-запросов, задержки и размера ответа для всех '
+            'маршрутов API на тестовой базе данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=300)
+        parser.add_argument('--ingredients', type=int, default=500)
+        parser.add_argument('--favorites', type=int, default=1000)
+        parser.add_argument('--carts', type=int, default=500)
+        parser.add_argument('--subscriptions', type=int, default=300)
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз выполнить каждый сценарий.')
+        parser.add_argument(
+            '--baseline',
+            default=BASELINE,
+            help='Файл с базовой линией (бюджетом) маршрутов.')
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Записать результаты как новую базовую линию.')
+        parser.add_argument(
+            '--record-latency', action='store_true',
+            help='Записать в базовую линию и задержку (только для '
+                 'локальной базовой линии той же машины и БД).')
+        parser.add_argument(
+            '--latency-tolerance', type=float, default=1.0,
+            help='Допустимый рост p50 относительно базовой линии (доля).')
+        parser.add_argument(
+            '--size-tolerance', type=float, default=0.1,
+            help='Допустимый рост размера ответа (доля).')
+        parser.add_argument(
+            '--skip-latency', action='store_true',
+            help='Не сравнивать задержку с локальной базовой линией.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше нуля.')
+        uncovered = (reachable_routes() - SKIPPED
+                     - {step.route for steps in SCENARIOS for step in steps})
+        if uncovered:
+            raise CommandError(
+                'Нет сценариев для маршрутов: ' + ', '.join(sorted(uncovered)))
+        volumes = {name: options[name] for name in (
+            'users', 'recipes', 'ingredients', 'favorites', 'carts',
+            'subscriptions')}
+        old_name = connection.settings_dict['NAME']
+        media = tempfile.mkdtemp(prefix='foodgram_benchmark_')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(
+                    ALLOWED_HOSTS=['testserver'], MEDIA_ROOT=media,
+                    DATABASE_REPLICAS=[],
+                    METRICS_DIR=os.path.join(media, 'metrics'),
+                    CACHES={'default': {
+                        **settings.CACHES['default'],
+                        'KEY_PREFIX': f'benchmark-{uuid.uuid4().hex}'}}):
+                state = seed(**volumes)
+                results = self.run_scenarios(state, options['repeat'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.report(results, volumes, options)
+
+    def run_scenarios(self, state, repeat):
+        results = {}
+        for steps in SCENARIOS:
+            for attempt in range(repeat + 1):
+                state['counter'] += 1
+                for step in steps:
+                    # Первый прогон прогревает кэши и не учитывается.
+                    self.run_step(step, state, results if attempt else {})
+        return results
+
+    def run_step(self, step, state, results):
+        result = perform(step, state)
+        if result.status != step.status:
+            raise CommandError(
+                f'{step.key}: {step.method.upper()} {result.path} вернул '
+                f'{result.status}, ожидался {step.status}: '
+                f'{result.content[:300]!r}')
+        measured = results.setdefault(
+            step.key, {'queries': 0, 'samples': [], 'bytes': 0})
+        measured['queries'] = max(measured['queries'], result.queries)
+        measured['bytes'] = max(measured['bytes'], len(result.content))
+        measured['samples'].append(result.elapsed)
+
+    def report(self, results, volumes, options):
+        measured = {
+            key: {
+                'queries': result['queries'],
+                'p50_ms': round(statistics.median(result['samples']), 2),
+                'p95_ms': round(percentile(result['samples'], 95), 2),
+                'bytes': result['bytes'],
+            }
+            for key, result in results.items()
+        }
+        if options['update_baseline']:
+            # Задержка зависит от машины и СУБД, поэтому в общую базовую
+            # линию попадают только число запросов и размер ответа.
+            routes = {
+                key: result if options['record_latency'] else {
+                    'queries': result['queries'], 'bytes': result['bytes']}
+                for key, result in measured.items()
+            }
+            with open(options['baseline'], 'w', encoding='utf-8') as file:
+                json.dump({'volumes': volumes, 'routes': routes}, file,
+                          ensure_ascii=False, indent=2, sort_keys=True)
+                file.write('\n')
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING(
+                f'Базовая линия {options["baseline"]} не найдена, '
+                'запустите команду с --update-baseline.'))
+            baseline = {'volumes': volumes, 'routes': measured}
+        else:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+        if baseline['volumes'] != volumes:
+            self.stdout.write(self.style.WARNING(
+                'Объемы данных отличаются от базовой линии: '
+                f'{baseline["volumes"]}'))
+        failures = []
+        self.stdout.write(f'{"маршрут":45} {"SQL":>5} {"p50, мс":>9} '
+                          f'{"p95, мс":>9} {"байт":>9}')
+        for key, result in measured.items():
+            budget = baseline['routes'].get(key)
+            problems = self.compare(result, budget, options)
+            line = (f'{key:45} {result["queries"]:>5} {result["p50_ms"]:>9} '
+                    f'{result["p95_ms"]:>9} {result["bytes"]:>9}')
+            if problems:
+                failures.append(f'{key}: {"; ".join(problems)}')
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+        if failures:
+            raise CommandError(
+                'Превышен бюджет производительности:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('Бюджет не превышен.'))
+
+    def compare(self, result, budget, options):
+        if budget is None:
+            return ['нет в базовой линии']
+        problems = []
+        if result['queries'] > budget['queries']:
+            problems.append(
+                f'SQL-запросов {result["queries"]} > {budget["queries"]}')
+        if not options['skip_latency'] and 'p50_ms' in budget:
+            limit = budget['p50_ms'] * (1 + options['latency_tolerance'])
+            if result['p50_ms'] > limit:
+                problems.append(
+                    f'p50 {result["p50_ms"]} мс > {limit:.2f} мс')
+        limit = budget['bytes'] * (1 + options['size_tolerance'])
+        if result['bytes'] > limit:
+            problems.append(f'размер {result["bytes"]} > {limit:.0f} байт')
+        return problems
@@ -0,0 +1,115 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import (IngredientsSerializer,
+                             RecipeIngredientsSerializer,
+                             ShortCutRecipeSerializer, TagsSerializer)
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import User
+
+SERIALIZERS = (
+    (IngredientsSerializer, Ingredient.objects.all),
+    (TagsSerializer, Tag.objects.all),
+    (RecipeIngredientsSerializer,
+     lambda: RecipeIngredients.objects.select_related('ingredient')),
+    (ShortCutRecipeSerializer, Recipe.objects.all),
+)
+
+
+class Command(BaseCommand):
+    help = ('Сравнение процессорного времени ValuesListSerializer с '
+            'обычным ListSerializer на тестовой базе данных.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз сериализовать каждый список (берется минимум).')
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError('--rows и --repeat должны быть больше нуля.')
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                self.seed(options['rows'])
+                results = [self.measure(serializer_class, queryset,
+                                        options['repeat'])
+                           for serializer_class, queryset in SERIALIZERS]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+        self.stdout.write(
+            'мс CPU на 1000 строк: из QuerySet (с чтением из базы) и из '
+            'уже загруженных объектов')
+        self.stdout.write(f'{"сериализатор":28} {"строк":>6} '
+                          f'{"QuerySet":>9} {"план":>7} '
+                          f'{"объекты":>9} {"план":>7}')
+        for name, rows, timings in results:
+            per_1k = [f'{timing * 1000 * 1000 / rows:.2f}'
+                      for timing in timings]
+            self.stdout.write(
+                f'{name:28} {rows:>6} {per_1k[0]:>9} {per_1k[1]:>7} '
+                f'{per_1k[2]:>9} {per_1k[3]:>7}')
+
+    def seed(self, rows):
+        author = User.objects.create(
+            username='benchmark', email='benchmark@benchmark.ru',
+            first_name='Имя', last_name='Фамилия')
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i}', measurement_unit='г')
+            for i in range(rows))
+        Tag.objects.bulk_create(
+            Tag(name=f'тег {i}', color=f'#{i:06x}', slug=f'tag-{i}')
+            for i in range(rows))
+        Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'рецепт {i}', text='текст',
+                   cooking_time=i % 100 + 1, image=f'recipes/{i}.png',
+                   image_variants={'small': {'webp': f'recipes/{i}.webp'}})
+            for i in range(rows))
+        recipes = list(Recipe.objects.values_list('pk', flat=True))
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe_id=recipes[i % len(recipes)],
+                              ingredient_id=pk, amount=i + 1)
+            for i, pk in enumerate(
+                Ingredient.objects.values_list('pk', flat=True)))
+
+    def measure(self, serializer_class, queryset, repeat):
+        """Время ListSerializer и плана полей для QuerySet и для уже
+        загруженных объектов."""
+        context = {'request': Request(APIRequestFactory().get('/'))}
+
+        def reference(data):
+            serializer = serializers.ListSerializer(
+                child=serializer_class(context=context), context=context)
+            return serializers.ListSerializer.to_representation(
+                serializer, data)
+
+        def values(data):
+            return serializer_class(data, many=True, context=context).data
+
+        loaded = list(queryset())
+        runs = ((reference, queryset), (values, queryset),
+                (reference, lambda: loaded), (values, lambda: loaded))
+        timings, outputs = [], []
+        for serialize, data in runs:
+            best = None
+            for _ in range(repeat):
+                start = time.process_time()
+                output = serialize(data())
+                elapsed = time.process_time() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings.append(best)
+            outputs.append(JSONRenderer().render(output))
+        if len(set(outputs)) != 1:
+            raise CommandError(
+                f'{serializer_class.__name__}: вывод отличается от '
+                'ListSerializer.')
+        return serializer_class.__name__, len(loaded), timings
@@ -0,0 +1,272 @@
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SUMS = (
+    ('sql_queries', 'foodgram_request_sql_queries_total',
+     'Количество SQL-запросов.'),
+    ('sql_seconds', 'foodgram_request_sql_seconds_total',
+     'Время выполнения SQL-запросов, с.'),
+    ('app_seconds', 'foodgram_request_app_seconds_total',
+     'Время обработчика представления без SQL-запросов, с.'),
+    ('render_seconds', 'foodgram_request_render_seconds_total',
+     'Время рендеринга ответа, с.'),
+)
+
+current_request = ContextVar('current_request_metrics', default=None)
+
+
+class RequestMetrics:
+    """Показатели одного запроса."""
+
+    def __init__(self):
+        self.sql_queries = 0
+        self.sql_seconds = 0.0
+        self.app_seconds = 0.0
+        self.render_seconds = 0.0
+        self.depth = 0
+
+    def sql(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - start
+            self.sql_queries += 1
+
+    def server_timing(self, total):
+        return ', '.join((
+            f'db;desc="SQL x{self.sql_queries}";'
+            f'dur={self.sql_seconds * 1000:.2f}',
+            f'app;dur={self.app_seconds * 1000:.2f}',
+            f'render;dur={self.render_seconds * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ))
+
+
+@contextmanager
+def measure(name):
+    """Добавляет время блока к показателю name текущего запроса.
+
+    Вложенные замеры одного показателя не суммируются повторно.
+    """
+    metrics = current_request.get()
+    if metrics is None or metrics.depth:
+        yield
+        return
+    metrics.depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.depth -= 1
+        setattr(metrics, name,
+                getattr(metrics, name) + time.perf_counter() - start)
+
+
+class AppTimingMixin:
+    """Время обработчика представления без SQL-запросов.
+
+    Отсчет идет от конца initial() (аутентификация и права) до
+    finalize_response(): сериализация, проверка прав на объект и
+    остальной код обработчика.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        metrics = current_request.get()
+        if metrics is not None:
+            self.handler_started = (time.perf_counter(), metrics.sql_seconds)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        metrics = current_request.get()
+        started = getattr(self, 'handler_started', None)
+        if metrics is not None and started is not None:
+            start, sql_seconds = started
+            elapsed = time.perf_counter() - start
+            metrics.app_seconds += max(
+                0.0, elapsed - (metrics.sql_seconds - sql_seconds))
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+def merge(total, data):
+    """Добавляет агрегаты процесса data к total."""
+    views = total.setdefault('views', {})
+    for key, item in data.get('views', {}).items():
+        if key not in views:
+            views[key] = item
+            continue
+        for field, value in item.items():
+            if field == 'buckets':
+                views[key][field] = [
+                    a + b for a, b in zip(views[key][field], value)]
+            else:
+                views[key][field] += value
+    counters = total.setdefault('cache', {})
+    for key, count in data.get('cache', {}).items():
+        counters[key] = counters.get(key, 0) + count
+    return total
+
+
+def read_metrics(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_metrics(path, data):
+    with open(f'{path}.tmp', 'w') as file:
+        json.dump(data, file)
+    os.replace(f'{path}.tmp', path)
+
+
+def retire_worker(pid):
+    """Переносит агрегаты завершившегося процесса pid в общий файл
+    METRICS_DIR/metrics_dead.json и удаляет его файлы.
+
+    Вызывается из хука child_exit мастер-процесса gunicorn, поэтому
+    общий файл пишет только один процесс.
+    """
+    paths = glob.glob(os.path.join(settings.METRICS_DIR,
+                                   f'metrics_{pid}_*.json'))
+    if not paths:
+        return
+    dead = os.path.join(settings.METRICS_DIR, 'metrics_dead.json')
+    total = read_metrics(dead)
+    for path in paths:
+        merge(total, read_metrics(path))
+    write_metrics(dead, total)
+    for path in paths:
+        os.remove(path)
+
+
+class MetricsRegistry:
+    """Агрегаты по представлениям и счетчики кэша ответов в пределах
+    процесса.
+
+    Каждый процесс gunicorn периодически сбрасывает свои агрегаты в
+    отдельный файл METRICS_DIR/metrics_<pid>_<start>.json (атомарной
+    заменой), а endpoint метрик суммирует файлы всех процессов. Время
+    старта в имени не дает новому процессу с тем же pid затереть итоги
+    завершившегося; после выхода процесса retire_worker() переносит их
+    в metrics_dead.json.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.cache = {}
+        self.flushed_at = 0.0
+        self.pid = None
+        self.started = None
+
+    @property
+    def path(self):
+        """Файл текущего процесса; после fork назначается заново."""
+        pid = os.getpid()
+        if pid != self.pid:
+            self.pid, self.started = pid, time.time_ns()
+        return os.path.join(settings.METRICS_DIR,
+                            f'metrics_{pid}_{self.started}.json')
+
+    def observe(self, view, method, status, duration, metrics):
+        key = f'{view}|{method}|{status // 100}xx'
+        with self.lock:
+            item = self.views.setdefault(key, {
+                'count': 0, 'duration_seconds': 0.0,
+                'buckets': [0] * len(BUCKETS),
+                **{name: 0 for name, _, _ in SUMS},
+            })
+            item['count'] += 1
+            item['duration_seconds'] += duration
+            for index, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    item['buckets'][index] += 1
+            for name, _, _ in SUMS:
+                item[name] += getattr(metrics, name)
+        interval = settings.METRICS_FLUSH_INTERVAL
+        if time.monotonic() - self.flushed_at > interval:
+            self.flush()
+
+    def count_cache(self, model, result):
+        """Попадание (hit) или промах (miss) кэша ответов модели."""
+        key = f'{model}|{result}'
+        with self.lock:
+            self.cache[key] = self.cache.get(key, 0) + 1
+
+    def flush(self):
+        with self.lock:
+            payload = json.dumps({'views': self.views, 'cache': self.cache})
+            self.flushed_at = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        path = self.path
+        with open(f'{path}.tmp', 'w') as file:
+            file.write(payload)
+        os.replace(f'{path}.tmp', path)
+
+    def collect(self):
+        """Сумма агрегатов всех процессов."""
+        self.flush()
+        total = {}
+        for name in os.listdir(settings.METRICS_DIR):
+            if name.endswith('.json'):
+                merge(total, read_metrics(
+                    os.path.join(settings.METRICS_DIR, name)))
+        return total
+
+    def export(self):
+        """Агрегаты в текстовом формате Prometheus."""
+        total = self.collect()
+        views = total['views']
+        lines = [
+            '# HELP foodgram_request_duration_seconds '
+            'Время обработки запроса, с.',
+            '# TYPE foodgram_request_duration_seconds histogram',
+        ]
+        for key, item in sorted(views.items()):
+            labels = self.labels(key)
+            for bound, count in zip(BUCKETS, item['buckets']):
+                lines.append(
+                    'foodgram_request_duration_seconds_bucket'
+                    f'{{{labels},le="{bound}"}} {count}')
+            lines.extend((
+                'foodgram_request_duration_seconds_bucket'
+                f'{{{labels},le="+Inf"}} {item["count"]}',
+                f'foodgram_request_duration_seconds_sum{{{labels}}} '
+                f'{item["duration_seconds"]}',
+                f'foodgram_request_duration_seconds_count{{{labels}}} '
+                f'{item["count"]}',
+            ))
+        for name, metric, description in SUMS:
+            lines.extend((f'# HELP {metric} {description}',
+                          f'# TYPE {metric} counter'))
+            for key, item in sorted(views.items()):
+                lines.append(f'{metric}{{{self.labels(key)}}} {item[name]}')
+        if total['cache']:
+            lines.extend((
+                '# HELP foodgram_response_cache_total '
+                'Обращения к кэшу ответов.',
+                '# TYPE foodgram_response_cache_total counter',
+            ))
+            for key, count in sorted(total['cache'].items()):
+                model, result = key.split('|')
+                lines.append('foodgram_response_cache_total'
+                             f'{{model="{model}",result="{result}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def labels(key):
+        view, method, status = key.split('|')
+        return f'view="{view}",method="{method}",status="{status}"'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,37 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from api.metrics import RequestMetrics, current_request, registry
+
+
+class PerformanceMiddleware:
+    """Замер SQL, обработчика и рендеринга для каждого запроса.
+
+    Итоги отдаются в заголовке Server-Timing и накапливаются в
+    гистограммах по представлениям для /api/metrics/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        token = current_request.set(metrics)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(metrics.sql))
+                response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+        duration = time.perf_counter() - start
+        response['Server-Timing'] = metrics.server_timing(duration)
+        match = getattr(request, 'resolver_match', None)
+        registry.observe(match.view_name if match else 'unresolved',
+                         request.method, response.status_code, duration,
+                         metrics)
+        return response
@@ -0,0 +1,118 @@
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Курсорная пагинация ленты рецептов по индексу (pub_date, id)."""
+    ordering = ('-pub_date', '-id')
+
+
+class RecipePagination(PageNumberPagination):
+    """Постраничная пагинация с курсорным режимом по запросу.
+
+    По умолчанию ответ содержит count, next, previous и results, как и
+    раньше. С параметром ?pagination=cursor (или при наличии ?cursor=)
+    используется курсорная пагинация без COUNT(*) и OFFSET. Результаты
+    поиска (?search=) упорядочены по релевантности, а не по дате, и
+    всегда разбиваются на страницы по номеру.
+    """
+    mode_query_param = 'pagination'
+    search_query_param = 'search'
+    cursor_class = RecipeCursorPagination
+
+    def __init__(self):
+        self.cursor_paginator = self.cursor_class()
+        self.use_cursor = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_paginator.cursor_query_param
+            in request.query_params
+        ) and not request.query_params.get(self.search_query_param)
+        if self.use_cursor:
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.use_cursor:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class FeedPagination(CursorPagination):
+    """Курсорная пагинация ленты по ключу (pub_date, id рецепта).
+
+    Позиция курсора - дата публикации и id последнего рецепта страницы,
+    поэтому курсор одинаков для записей ленты (FeedEntry, recipe_field
+    recipe_id) и для рецептов (recipe_field id) и остается
+    действительным, когда автор переходит из одного режима ленты в
+    другой.
+    """
+    ordering = ('-pub_date', '-id')
+
+    def __init__(self, recipe_field='id'):
+        self.recipe_field = recipe_field
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        ordering = ('pub_date', self.recipe_field)
+        if not reverse:
+            ordering = tuple(f'-{field}' for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            pub_date, pk = self.parse_position(self.cursor.position)
+            lookup = 'gt' if reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'pub_date__{lookup}': pub_date})
+                | Q(pub_date=pub_date,
+                    **{f'{self.recipe_field}__{lookup}': pk}))
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        has_more = len(results) > self.page_size
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_position(self, instance):
+        return '{}_{}'.format(
+            instance.pub_date.isoformat(),
+            getattr(instance, self.recipe_field))
+
+    def parse_position(self, position):
+        pub_date, _, pk = (position or '').rpartition('_')
+        try:
+            pub_date = parse_datetime(pub_date)
+            pk = int(pk)
+        except ValueError:
+            pub_date = None
+        if pub_date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return pub_date, pk
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False,
+            position=self.get_position(self.page[-1])))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=True,
+            position=self.get_position(self.page[0])))
@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from operator import attrgetter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+
+# Поля, у которых to_representation не меняет значение из базы данных.
+PLAIN_FIELDS = (serializers.ReadOnlyField, serializers.CharField,
+                serializers.SlugField, serializers.IntegerField,
+                serializers.BooleanField)
+
+
+def get_model_field(model, attrs):
+    """Поле модели по цепочке source_attrs через обязательные внешние
+    ключи; None, если значение нельзя получить из values_list()."""
+    for position, attr in enumerate(attrs):
+        try:
+            field = model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return None
+        if position == len(attrs) - 1:
+            return None if field.is_relation else field
+        if not (field.many_to_one or field.one_to_one) or field.null:
+            return None
+        model = field.related_model
+    return None
+
+
+class FieldPlan:
+    """Заранее разобранные поля сериализатора для чтения.
+
+    Для каждого поля хранит путь для values_list(), способ получения
+    атрибута объекта и преобразование значения. Результат совпадает с
+    to_representation сериализатора, но без обхода полей DRF на каждую
+    строку. Вложенные сериализаторы, SerializerMethodField и связи не
+    поддерживаются: для них build() возвращает None.
+    """
+
+    def __init__(self, names, lookups, getters, converters):
+        self.names = names
+        self.lookups = lookups
+        self.getters = getters
+        self.converters = converters
+
+    @classmethod
+    def build(cls, serializer):
+        model = serializer.Meta.model
+        names, lookups, getters, converters = [], [], [], []
+        for field in serializer._readable_fields:
+            if (field.source == '*'
+                    or type(field).get_attribute
+                    is not serializers.Field.get_attribute
+                    or isinstance(field, (serializers.BaseSerializer,
+                                          serializers.RelatedField,
+                                          serializers.ManyRelatedField))):
+                return None
+            model_field = get_model_field(model, field.source_attrs)
+            if model_field is None:
+                return None
+            names.append(field.field_name)
+            lookups.append('__'.join(field.source_attrs))
+            getters.append(attrgetter('.'.join(field.source_attrs)))
+            converters.append(cls.get_converter(field, model_field))
+        return cls(names, lookups, getters, converters)
+
+    @staticmethod
+    def get_converter(field, model_field):
+        """Преобразование (строка values_list, атрибут объекта)."""
+        if type(field) in PLAIN_FIELDS:
+            return None, None
+        convert = field.to_representation
+        if isinstance(model_field, models.FileField):
+            def from_row(name):
+                return convert(model_field.attr_class(None, model_field, name))
+            return from_row, convert
+        return convert, convert
+
+    def represent(self, values, converters):
+        return OrderedDict(
+            (name, value if convert is None or value is None
+             else convert(value))
+            for name, value, convert in zip(self.names, values, converters))
+
+    def from_rows(self, rows):
+        """Словари по строкам values_list(*lookups)."""
+        converters = [row for row, _ in self.converters]
+        for values in rows:
+            yield self.represent(values, converters)
+
+    def from_objects(self, objects):
+        converters = [convert for _, convert in self.converters]
+        for obj in objects:
+            yield self.represent(
+                [getter(obj) for getter in self.getters], converters)
+
+
+class ValuesListSerializer(serializers.ListSerializer):
+    """Список только для чтения по плану полей дочернего сериализатора.
+
+    Невычисленный QuerySet читается через values_list() без создания
+    объектов моделей; уже загруженные объекты (например, после
+    prefetch_related) обходятся тем же планом. Если план построить
+    нельзя, работает обычный ListSerializer.
+    """
+
+    @property
+    def plan(self):
+        if not hasattr(self, '_plan'):
+            self._plan = FieldPlan.build(self.child)
+        return self._plan
+
+    def to_representation(self, data):
+        if self.plan is None:
+            return super().to_representation(data)
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        if (isinstance(iterable, models.QuerySet)
+                and iterable._result_cache is None):
+            return list(self.plan.from_rows(
+                iterable.values_list(*self.plan.lookups)))
+        return list(self.plan.from_objects(iterable))
+
+    def iter_representation(self, queryset, chunk_size=2000):
+        """Построчная выдача для потоковых ответов."""
+        if self.plan is None:
+            return map(self.child.to_representation,
+                       queryset.iterator(chunk_size=chunk_size))
+        return self.plan.from_rows(queryset.values_list(
+            *self.plan.lookups).iterator(chunk_size=chunk_size))
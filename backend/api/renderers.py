@@ -0,0 +1,102 @@
+import json
+
+from rest_framework.utils import encoders
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+from api.metrics import measure
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+                  if orjson is not None else 0)
+
+
+def escape_separators(content):
+    """Экранирует U+2028 и U+2029, как JSONRenderer: иначе ответ
+    нельзя встроить в JavaScript."""
+    return content.replace(
+        '\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+def dumps(data):
+    """Компактный JSON в UTF-8, совпадающий с выводом JSONRenderer.
+
+    Использует orjson, если он установлен, иначе стандартный json.
+    Типы, которые orjson не знает (Decimal, ленивые строки и т.п.),
+    преобразует JSONEncoder из DRF.
+    """
+    if orjson is not None:
+        content = orjson.dumps(data, default=encoders.JSONEncoder().default,
+                               option=ORJSON_OPTIONS)
+    else:
+        content = json.dumps(data, cls=encoders.JSONEncoder,
+                             ensure_ascii=False,
+                             separators=(',', ':')).encode()
+    return escape_separators(content)
+
+
+class PlainTextRenderer(BaseRenderer):
+    """Текстовый ответ: список покупок и сообщения об ошибках."""
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, bytes):
+            return data
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset)
+
+
+class CSVRenderer(PlainTextRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class TimedJSONRenderer(JSONRenderer):
+    """JSONRenderer с замером времени рендеринга для Server-Timing."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        with measure('render_seconds'):
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+class FastJSONRenderer(TimedJSONRenderer):
+    """JSON-рендерер на orjson с тем же выводом, что у JSONRenderer.
+
+    Без orjson, с отступами (Accept: application/json; indent=4) и при
+    выключенных UNICODE_JSON или COMPACT_JSON работает как
+    TimedJSONRenderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None
+                or not (self.ensure_ascii is False and self.compact)
+                or self.get_indent(accepted_media_type,
+                                   renderer_context or {})):
+            return super().render(data, accepted_media_type, renderer_context)
+        with measure('render_seconds'):
+            if data is None:
+                return b''
+            return dumps(data)
+
+
+def stream_json(items, chunk_size=2000):
+    """Генератор JSON-массива: элементы отдаются пачками, весь список в
+    памяти не собирается."""
+    yield b'['
+    separator = b''
+    chunk = []
+    for position, item in enumerate(items, 1):
+        chunk.append(dumps(item))
+        if position % chunk_size == 0:
+            yield separator + b','.join(chunk)
+            separator = b','
+            chunk = []
+    if chunk:
+        yield separator + b','.join(chunk)
+    yield b']'
@@ -0,0 +1,78 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+replica_state = ContextVar('replica_state', default=None)
+
+
+class ReplicaState:
+    """Маршрутизация запросов к БД в рамках одного HTTP-запроса."""
+
+    def __init__(self):
+        self.written = False
+
+
+class ReplicaRouter:
+    """Чтение с реплик для разрешенных представлений, запись в default.
+
+    Реплики используются, только если представление включило их для
+    текущего запроса (ReplicaReadMixin) и в этом запросе еще не было
+    записи: после первой записи все чтения идут в основную БД, чтобы
+    запрос видел собственные изменения.
+    """
+
+    def db_for_read(self, model, **hints):
+        # Связанные объекты читаются из той же БД, что и сам объект.
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        state = replica_state.get()
+        if state is None or state.written or not settings.DATABASE_REPLICAS:
+            return 'default'
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = replica_state.get()
+        if state is not None:
+            state.written = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReplicaReadMixin:
+    """Направляет чтения безопасных запросов replica_actions на реплики.
+
+    Аутентификация и проверка прав выполняются до переключения, на
+    основной БД.
+    """
+    replica_actions = ('list', 'retrieve')
+    replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if (request.method in SAFE_METHODS
+                and self.action in self.replica_actions):
+            self.replica_token = replica_state.set(ReplicaState())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        self.reset_replica_state()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def dispatch(self, request, *args, **kwargs):
+        # Необработанное исключение пропускает finalize_response.
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            self.reset_replica_state()
+
+    def reset_replica_state(self):
+        if self.replica_token is not None:
+            replica_state.reset(self.replica_token)
+            self.replica_token = None
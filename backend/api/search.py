@@ -0,0 +1,89 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from heapq import nsmallest
+
+from django.conf import settings
+
+from api.cache import get_version
+from recipes.models import Ingredient
+
+
+class IngredientIndex:
+    """Индекс ингредиентов в памяти процесса для автодополнения.
+
+    Имена хранятся в отсортированном массиве в нижнем регистре (casefold),
+    поиск по началу названия выполняется бинарным поиском, затем, если
+    их меньше лимита, добавляются совпадения по вхождению подстроки.
+    Кандидаты для них берутся из триграммного индекса (самый короткий
+    список позиций среди триграмм запроса), поэтому полного просмотра
+    имен нет; запросы короче трех символов ищутся только по началу
+    названия. Без limit действует INGREDIENT_SEARCH_LIMIT. Индекс строится
+    лениво при первом запросе и перестраивается, когда меняется версия
+    ингредиентов в общем кэше (ее обновляют сигналы и load_data), но не
+    реже чем раз в INGREDIENT_INDEX_TTL секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+
+    def invalidate(self):
+        self._state = None
+
+    def build(self, version):
+        rows = {
+            pk: {'id': pk, 'name': name, 'measurement_unit': unit}
+            for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit').iterator()
+        }
+        entries = sorted((row['name'].casefold(), pk)
+                         for pk, row in rows.items())
+        keys = [key for key, _ in entries]
+        ids = [pk for _, pk in entries]
+        trigrams = {}
+        for position, key in enumerate(keys):
+            for trigram in {key[i:i + 3] for i in range(len(key) - 2)}:
+                trigrams.setdefault(trigram, []).append(position)
+        trigrams = {trigram: array('I', positions)
+                    for trigram, positions in trigrams.items()}
+        return time.monotonic(), version, keys, ids, rows, trigrams
+
+    def _get_state(self):
+        state = self._state
+        version, _ = get_version(Ingredient)
+        if (state is None or state[1] != version
+                or time.monotonic() - state[0]
+                > settings.INGREDIENT_INDEX_TTL):
+            with self._lock:
+                if self._state is None or self._state is state:
+                    self._state = self.build(version)
+                state = self._state
+        return state
+
+    def search(self, query, limit=None):
+        _, _, keys, ids, rows, trigrams = self._get_state()
+        query = query.casefold()
+        if limit is None:
+            limit = settings.INGREDIENT_SEARCH_LIMIT
+        start = bisect_left(keys, query)
+        end = start
+        while (end < len(keys) and end - start < limit
+               and keys[end].startswith(query)):
+            end += 1
+        found = ids[start:end]
+        if len(found) < limit and len(query) >= 3:
+            candidates = min(
+                (trigrams.get(query[i:i + 3], ())
+                 for i in range(len(query) - 2)), key=len)
+            contains = nsmallest(limit - len(found), (
+                (keys[position].find(query), keys[position], ids[position])
+                for position in candidates
+                if query in keys[position]
+                and not keys[position].startswith(query)))
+            found += [pk for _, _, pk in contains]
+        return [rows[pk] for pk in found[:limit]]
+
+
+ingredient_index = IngredientIndex()
@@ -1,16 +1,22 @@
 import re
+from collections import OrderedDict
 
+from django.conf import settings
 from django.core.validators import MinValueValidator
-from django.shortcuts import get_object_or_404
+from django.db import models, transaction
 from djoser.serializers import UserCreateSerializer
 from djoser.serializers import UserSerializer as DjoserUserSerializer
 from drf_extra_fields.fields import Base64ImageField
 from rest_framework import serializers
 
+from api.fields import ImageVariantsField, LimitedBase64ImageField
+from api.fragments import get_fragments, get_versions, set_fragments
+from api.loaders import PrimingListSerializer, get_loader
+from api.plans import ValuesListSerializer
 from api.validators import validate_amount
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
-                            ShoppingCart, Tag)
-from users.models import Subscription, User
+from recipes import shopping_list
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import User
 
 
 class UserSerializer(DjoserUserSerializer):
@@ -21,12 +27,18 @@ class UserSerializer(DjoserUserSerializer):
         model = User
         fields = ('id', 'username', 'first_name', 'last_name', 'email',
                   'is_subscribed')
+        list_serializer_class = PrimingListSerializer
+
+    def prime(self, loader, users):
+        loader.prime('subscriptions', (user.pk for user in users))
 
     def get_is_subscribed(self, object):
-        user = self.context.get('request').user
-        if user.is_anonymous:
+        if hasattr(object, 'is_subscribed'):
+            return object.is_subscribed
+        loader = get_loader(self.context)
+        if loader is None:
             return False
-        return Subscription.objects.filter(user=user, author=object).exists()
+        return loader.has('subscriptions', object.pk)
 
 
 class UserCreateSerializer(UserCreateSerializer):
@@ -54,15 +66,16 @@ class UserCreateSerializer(UserCreateSerializer):
 class SubscriptionSerializer(UserSerializer):
     """Сериализатор подписок"""
     recipes = serializers.SerializerMethodField(method_name='get_recipe')
-    recipes_count = serializers.SerializerMethodField(
-        method_name='get_recipes_count'
-    )
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta(UserSerializer.Meta):
         fields = UserSerializer.Meta.fields + ('recipes_count', 'recipes')
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
 
     def get_recipe(self, obj):
+        if hasattr(obj, 'preview_recipes'):
+            return ShortCutRecipeSerializer(
+                obj.preview_recipes, many=True).data
         request = self.context.get('request')
         limit = request.GET.get('recipes_limit')
         recipes = obj.recipes.all()
@@ -71,9 +84,6 @@ class SubscriptionSerializer(UserSerializer):
         serialized_recipes = ShortCutRecipeSerializer(recipes, many=True).data
         return serialized_recipes
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
-
 
 class TagsSerializer(serializers.ModelSerializer):
     """Сериализатор тэгов"""
@@ -82,6 +92,7 @@ class TagsSerializer(serializers.ModelSerializer):
         model = Tag
         fields = '__all__'
         read_only_fields = ('id',)
+        list_serializer_class = ValuesListSerializer
 
 
 class IngredientsSerializer(serializers.ModelSerializer):
@@ -90,6 +101,7 @@ class IngredientsSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = ('id', 'name', 'measurement_unit')
+        list_serializer_class = ValuesListSerializer
 
 
 class RecipeIngredientsSerializer(serializers.ModelSerializer):
@@ -102,6 +114,7 @@ class RecipeIngredientsSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecipeIngredients
         fields = ('id', 'name', 'measurement_unit', 'amount')
+        list_serializer_class = ValuesListSerializer
 
 
 class RecipeIngredientsCreateSerializer(serializers.ModelSerializer):
@@ -116,6 +129,16 @@ class RecipeIngredientsCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
+class RecipeListSerializer(PrimingListSerializer):
+    """Загружает фрагменты всех рецептов списка одним обращением к кэшу."""
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        recipes = list(iterable)
+        self.child.fragments = self.child.load_fragments(recipes)
+        return super().to_representation(recipes)
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """ Сериализатор получения рецептов"""
     name = serializers.ReadOnlyField()
@@ -123,6 +146,7 @@ class RecipeSerializer(serializers.ModelSerializer):
     tags = TagsSerializer(many=True, read_only=True)
     cooking_time = serializers.IntegerField()
     image = Base64ImageField(required=False, allow_null=True)
+    images = ImageVariantsField()
     ingredients = RecipeIngredientsSerializer(
         many=True,
         read_only=True,
@@ -135,24 +159,102 @@ class RecipeSerializer(serializers.ModelSerializer):
     class Meta:
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients', 'is_favorited',
-                  'is_in_shopping_cart', 'name', 'image', 'text',
-                  'cooking_time')
+                  'is_in_shopping_cart', 'name', 'image', 'images', 'text',
+                  'cooking_time', 'favorites_count')
         read_only_fields = ('id', 'author', 'name', 'is_favorited',
-                            'is_in_shopping_cart')
+                            'is_in_shopping_cart', 'favorites_count')
+        list_serializer_class = RecipeListSerializer
+
+    # Общая для всех пользователей часть рецепта, которая хранится в кэше.
+    # Признаки текущего пользователя и поля самого рецепта добавляются
+    # при каждом ответе.
+    fragment_fields = ('tags', 'author', 'ingredients')
+    fragments = None
+
+    def to_representation(self, instance):
+        fragments = self.fragments
+        if fragments is None or instance.pk not in fragments:
+            fragments = self.load_fragments([instance])
+        fragment = fragments.get(instance.pk)
+        if fragment is None:
+            if hasattr(instance, 'is_author_subscribed'):
+                instance.author.is_subscribed = instance.is_author_subscribed
+            return super().to_representation(instance)
+        ret = OrderedDict()
+        for field in self._readable_fields:
+            if field.field_name in fragment:
+                ret[field.field_name] = fragment[field.field_name]
+                continue
+            attribute = field.get_attribute(instance)
+            ret[field.field_name] = (
+                None if attribute is None
+                else field.to_representation(attribute))
+        ret['author'] = OrderedDict(
+            ret['author'], is_subscribed=self.get_author_subscribed(instance))
+        return ret
+
+    def load_fragments(self, recipes):
+        """Фрагменты рецептов из кэша.
+
+        Недостающие строятся по рецептам, заново прочитанным из основной
+        БД после чтения версий: рецепт, загруженный раньше или с
+        отстающей реплики, мог сохранить в кэш старые данные под новой
+        версией.
+        """
+        versions = get_versions(recipe.pk for recipe in recipes)
+        fragments = get_fragments(versions)
+        missing = [recipe.pk for recipe in recipes
+                   if recipe.pk not in fragments]
+        if not missing:
+            return fragments
+        loaded = Recipe.objects.using('default').with_related().in_bulk(
+            missing)
+        built = {pk: self.build_fragment(loaded[pk])
+                 for pk in missing if pk in loaded}
+        set_fragments(versions, built)
+        fragments.update(built)
+        return fragments
+
+    def build_fragment(self, recipe):
+        # Подписка зависит от пользователя и в фрагмент не попадает.
+        recipe.author.is_subscribed = False
+        fragment = {}
+        for name in self.fragment_fields:
+            field = self.fields[name]
+            fragment[name] = field.to_representation(
+                field.get_attribute(recipe))
+        fragment['author'].pop('is_subscribed')
+        return fragment
+
+    def get_author_subscribed(self, obj):
+        if hasattr(obj, 'is_author_subscribed'):
+            return obj.is_author_subscribed
+        loader = get_loader(self.context)
+        if loader is None:
+            return False
+        return loader.has('subscriptions', obj.author_id)
+
+    def prime(self, loader, recipes):
+        loader.prime('favorites', (recipe.pk for recipe in recipes))
+        loader.prime('shopping_cart', (recipe.pk for recipe in recipes))
+        loader.prime('subscriptions',
+                     (recipe.author_id for recipe in recipes))
 
     def get_favorited(self, obj):
-        request = self.context.get('request')
-        if request and not request.user.is_anonymous:
-            return Favorite.objects.filter(user=request.user,
-                                           recipe=obj).exists()
-        return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        loader = get_loader(self.context)
+        if loader is None:
+            return False
+        return loader.has('favorites', obj.pk)
 
     def get_shopping_cart(self, obj):
-        request = self.context.get('request')
-        if request and not request.user.is_anonymous:
-            return ShoppingCart.objects.filter(user=request.user,
-                                               recipe=obj).exists()
-        return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        loader = get_loader(self.context)
+        if loader is None:
+            return False
+        return loader.has('shopping_cart', obj.pk)
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -161,7 +263,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all(),
         many=True
     )
-    image = Base64ImageField(required=True)
+    image = LimitedBase64ImageField(required=True)
     ingredients = RecipeIngredientsCreateSerializer(
         many=True,)
     cooking_time = serializers.IntegerField()
@@ -189,14 +291,11 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     def validate_ingredients(self, value):
         if not value:
             raise serializers.ValidationError('Добавьте ингредиент.')
-        ingredients = [item['id'] for item in value]
-        for ingredient in ingredients:
-            if ingredients.count(ingredient) > 1:
-                raise serializers.ValidationError(
-                    'Такой ингредиент уже есть.'
-                )
-            if not Ingredient.objects.filter(pk=ingredient).first():
-                raise serializers.ValidationError('Ингредиент не найден.')
+        ingredients = {item['id'] for item in value}
+        if len(ingredients) != len(value):
+            raise serializers.ValidationError('Такой ингредиент уже есть.')
+        if len(Ingredient.objects.in_bulk(ingredients)) != len(ingredients):
+            raise serializers.ValidationError('Ингредиент не найден.')
         return value
 
     def validate_image(self, image):
@@ -211,39 +310,62 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return cooking_time
 
     def create_ingredient(self, ingredient, recipe):
-        for ingredient_data in ingredient:
-            amount = ingredient_data['amount']
-            ingredient_id = ingredient_data['id']
-            if ingredient_id:
-                ingredient = get_object_or_404(Ingredient, pk=ingredient_id)
-                RecipeIngredients.objects.create(
-                    recipe=recipe,
-                    ingredient=ingredient,
-                    amount=amount)
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(
+                recipe=recipe,
+                ingredient_id=ingredient_data['id'],
+                amount=ingredient_data['amount'])
+            for ingredient_data in ingredient
+        )
 
+    def update_ingredient(self, ingredient, recipe):
+        amounts = {item['id']: item['amount'] for item in ingredient}
+        current = {item.ingredient_id: item
+                   for item in recipe.recipeingredients.all()}
+        removed = current.keys() - amounts.keys()
+        if removed:
+            recipe.recipeingredients.filter(
+                ingredient_id__in=removed).delete()
+        changed = []
+        for ingredient_id, item in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if changed:
+            RecipeIngredients.objects.bulk_update(changed, ['amount'])
+        self.create_ingredient(
+            [item for item in ingredient if item['id'] not in current],
+            recipe)
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredient = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredient(ingredient, recipe)
-        recipe.save()
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         if 'ingredients' not in validated_data or 'tags' not in validated_data:
             raise serializers.ValidationError('Поле не может быть пустым.')
         ingredient = validated_data.pop('ingredients')
-        instance.ingredients.clear()
-        self.create_ingredient(ingredient, instance)
+        with shopping_list.updating_recipe(instance):
+            self.update_ingredient(ingredient, instance)
         instance.tags.set(validated_data.pop('tags'))
         return super().update(
             instance, validated_data)
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        # Связанные данные загрузит RecipeSerializer вместе с фрагментом.
+        instance = Recipe.objects.with_user_flags(
+            request.user).get(pk=instance.pk)
         serializer = RecipeSerializer(
             instance,
-            context={'request': self.context.get('request')}
+            context={'request': request}
         )
         return serializer.data
 
@@ -251,18 +373,33 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 class RecipeFavoriteSerializer(serializers.ModelSerializer):
     """Список рецептов в избранном."""
     image = Base64ImageField(read_only=True)
+    images = ImageVariantsField()
     name = serializers.ReadOnlyField()
     cooking_time = serializers.ReadOnlyField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
 
 
 class ShortCutRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор коротокого отображения рецепта"""
+    images = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'images', 'cooking_time')
         read_only_fields = ('id', 'name', 'image', 'cooking_time')
+        list_serializer_class = ValuesListSerializer
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для массового добавления и удаления."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.BULK_MAX_RECIPES,
+    )
+
+    def validate_recipes(self, recipes):
+        return list(dict.fromkeys(recipes))
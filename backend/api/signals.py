@@ -0,0 +1,103 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from api.authentication import RESET_FIELDS, token_cache
+from api.cache import bump_version
+from api.fragments import invalidate
+from api.search import ingredient_index
+from api.serializers import UserSerializer
+from recipes.models import Ingredient, Recipe, RecipeIngredients, Tag
+from users.models import User
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def reset_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+@receiver((post_save, post_delete), sender=Tag)
+def reset_reference_cache(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(sender))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver(post_save, sender=RecipeIngredients)
+@receiver((post_save, post_delete), sender=Tag)
+def reset_recipe_cache(sender, **kwargs):
+    """Новая версия рецептов после коммита, чтобы параллельный запрос
+    не сохранил в кэш старые данные под новой версией.
+
+    Ингредиенты и теги рецепта меняются только вместе с сохранением
+    или удалением самого рецепта, поэтому m2m_changed и post_delete
+    для них не подключены: без получателей Django удаляет строки и
+    добавляет связи без дополнительных запросов.
+    """
+    transaction.on_commit(lambda: bump_version(Recipe))
+
+
+@receiver(post_delete, sender=Token)
+def reset_token(sender, instance, **kwargs):
+    """Выход через token/logout, удаление токена в админке или удаление
+    пользователя."""
+    user_id = instance.user_id
+    transaction.on_commit(lambda: token_cache.invalidate(user_id))
+
+
+@receiver(post_save, sender=User)
+def reset_user_tokens(sender, instance, created, update_fields=None,
+                      **kwargs):
+    """Смена пароля, прав или полей пользователя из кэша токенов; вход
+    обновляет только last_login и кэш не сбрасывает."""
+    if created or update_fields and not RESET_FIELDS & set(update_fields):
+        return
+    user_id = instance.pk
+    transaction.on_commit(lambda: token_cache.invalidate(user_id))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def reset_recipe_fragment(sender, instance, **kwargs):
+    invalidate([instance.pk])
+
+
+@receiver(post_save, sender=RecipeIngredients)
+def reset_ingredients_fragment(sender, instance, **kwargs):
+    invalidate([instance.recipe_id])
+
+
+@receiver((post_save, pre_delete), sender=Tag)
+def reset_tag_fragments(sender, instance, **kwargs):
+    """До удаления тега, пока его связи с рецептами еще есть."""
+    invalidate(Recipe.tags.through.objects.filter(
+        tag_id=instance.pk).values_list('recipe_id', flat=True))
+
+
+def reset_used_recipes(recipe_ids):
+    """Фрагменты и кэш ответов рецептов, в карточках которых выводится
+    измененный объект."""
+    recipe_ids = list(recipe_ids)
+    if recipe_ids:
+        invalidate(recipe_ids)
+        transaction.on_commit(lambda: bump_version(Recipe))
+
+
+@receiver((post_save, pre_delete), sender=Ingredient)
+def reset_ingredient_fragments(sender, instance, **kwargs):
+    reset_used_recipes(RecipeIngredients.objects.filter(
+        ingredient_id=instance.pk).values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=User)
+def reset_author_fragments(sender, instance, created, update_fields=None,
+                           **kwargs):
+    """Только при изменении полей, которые выводятся в карточке автора:
+    вход обновляет last_login, и это не должно сбрасывать фрагменты."""
+    if created:
+        return
+    if update_fields and not set(update_fields) & set(
+            UserSerializer.Meta.fields):
+        return
+    reset_used_recipes(Recipe.objects.filter(
+        author_id=instance.pk).values_list('pk', flat=True))
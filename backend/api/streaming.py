@@ -0,0 +1,33 @@
+from django.http import StreamingHttpResponse
+
+from .plans import ValuesListSerializer
+from .renderers import stream_json
+
+
+class StreamingListMixin:
+    """Потоковая выдача списка без пагинации по ?stream=1.
+
+    Строки читаются через iterator() и сразу сериализуются (по плану
+    ValuesListSerializer, если он есть), поэтому память не растет
+    вместе со списком. База выбирается до выхода из
+    представления: генератор выполняется уже после finalize_response.
+    Поток отдается только в JSON, ответ не кэшируется.
+    """
+    stream_query_param = 'stream'
+
+    def list(self, request, *args, **kwargs):
+        if (request.query_params.get(self.stream_query_param)
+                not in ('1', 'true')
+                or request.accepted_renderer.format != 'json'):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.using(queryset.db)
+        serializer = self.get_serializer(many=True)
+        if isinstance(serializer, ValuesListSerializer):
+            items = serializer.iter_representation(queryset)
+        else:
+            items = map(serializer.child.to_representation,
+                        queryset.iterator())
+        return StreamingHttpResponse(
+            stream_json(items),
+            content_type='application/json')
@@ -3,7 +3,8 @@ from django.conf.urls.static import static
 from django.urls import include, path
 from rest_framework import routers
 
-from .views import IngredientsViewSet, RecipeViewSet, TagsViewSet, UserViewSet
+from .views import (IngredientsViewSet, MetricsView, RecipeViewSet,
+                    TagsViewSet, UserViewSet)
 
 app_name = 'api'
 
@@ -15,6 +16,7 @@ router.register('tags', TagsViewSet, basename='tags')
 router.register('recipes', RecipeViewSet, basename='recipes')
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
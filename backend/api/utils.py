@@ -0,0 +1,57 @@
+import csv
+import json
+
+from recipes.models import ShoppingListItem
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    """Готовый список покупок пользователя: чтение по индексу (user,
+    ingredient) без агрегации по рецептам корзины."""
+    return ShoppingListItem.objects.filter(
+        user=user, amount__gt=0
+    ).values(
+        'ingredient_id', 'ingredient__name', 'ingredient__measurement_unit',
+        'amount'
+    ).order_by('ingredient__name')
+
+
+def shopping_list_txt(items):
+    yield 'Список покупок:\n'
+    for item in items:
+        yield (f'{item["ingredient__name"]}, {item["amount"]} '
+               f'{item["ingredient__measurement_unit"]}\n')
+
+
+def shopping_list_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('name', 'amount', 'measurement_unit'))
+    for item in items:
+        yield writer.writerow((item['ingredient__name'], item['amount'],
+                               item['ingredient__measurement_unit']))
+
+
+def shopping_list_json(items):
+    separator = ''
+    yield '['
+    for item in items:
+        yield separator + json.dumps({
+            'name': item['ingredient__name'],
+            'amount': item['amount'],
+            'measurement_unit': item['ingredient__measurement_unit'],
+        }, ensure_ascii=False)
+        separator = ', '
+    yield ']'
+
+
+SHOPPING_LIST_WRITERS = {
+    'txt': shopping_list_txt,
+    'csv': shopping_list_csv,
+    'json': shopping_list_json,
+}
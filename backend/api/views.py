@@ -1,26 +1,43 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+import os
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.http import StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import exceptions, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.generics import get_object_or_404
 from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from api.filters import IngredientsFilter, RecipeFilter
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+from recipes import shopping_list
+from recipes.counters import COUNTERS, bulk, change_counters
+from recipes.models import (Favorite, FeedEntry, Ingredient, Recipe,
                             ShoppingCart, Tag)
 from users.models import Subscription, User
+from .cache import RecipeCacheMixin, ReferenceCacheMixin
+from .metrics import AppTimingMixin, registry
+from .pagination import FeedPagination, RecipePagination
 from .permissions import IsOwnerOrReadOnly
+from .renderers import CSVRenderer, PlainTextRenderer
+from .replicas import ReplicaReadMixin
+from .search import ingredient_index
 from .serializers import (IngredientsSerializer, RecipeCreateSerializer,
-                          RecipeFavoriteSerializer, RecipeSerializer,
-                          ShortCutRecipeSerializer, SubscriptionSerializer,
-                          TagsSerializer, UserSerializer)
+                          RecipeFavoriteSerializer, RecipeIdsSerializer,
+                          RecipeSerializer, ShortCutRecipeSerializer,
+                          SubscriptionSerializer, TagsSerializer,
+                          UserSerializer)
+from .streaming import StreamingListMixin
+from .utils import SHOPPING_LIST_WRITERS, get_shopping_list
 
 
-class UserViewSet(UserViewSet):
+class UserViewSet(AppTimingMixin, UserViewSet):
     """Класс работы с пользователями"""
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -63,7 +80,15 @@ class UserViewSet(UserViewSet):
     @action(detail=False, permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
         user = request.user
-        follows = User.objects.filter(following__user=user)
+        recipes = Recipe.objects.filter(author__following__user=user)
+        limit = request.query_params.get('recipes_limit')
+        if limit and limit.isdigit():
+            recipes = recipes.latest_per_author(int(limit))
+        follows = User.objects.filter(following__user=user).annotate(
+            is_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('pk'))),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='preview_recipes'))
         page = self.paginate_queryset(follows)
         serializer = SubscriptionSerializer(
             page, many=True,
@@ -71,33 +96,56 @@ class UserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientsViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientsViewSet(AppTimingMixin, ReplicaReadMixin,
+                         StreamingListMixin, ReferenceCacheMixin,
+                         viewsets.ReadOnlyModelViewSet):
     """Получение списка ингредиентов."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientsSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = IngredientsFilter
     permission_classes = (AllowAny,)
+    authentication_classes = ()
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        limit = request.query_params.get('limit')
+        return Response(ingredient_index.search(
+            name, int(limit) if limit and limit.isdigit() else None))
+
 
-class TagsViewSet(viewsets.ReadOnlyModelViewSet):
+class TagsViewSet(AppTimingMixin, ReplicaReadMixin, StreamingListMixin,
+                  ReferenceCacheMixin, viewsets.ReadOnlyModelViewSet):
     """Получпение списка тэгов."""
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
     permission_classes = (AllowAny, )
+    authentication_classes = ()
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(AppTimingMixin, ReplicaReadMixin,
+                    RecipeCacheMixin, viewsets.ModelViewSet):
     """Класс работы с рецептами."""
+    replica_actions = ('list',)
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (IsOwnerOrReadOnly, )
-    pagination_class = PageNumberPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        if self.action in ('list', 'retrieve'):
+            # Теги, автор и ингредиенты берутся из кэша фрагментов
+            # RecipeSerializer и загружаются только для промахов.
+            return Recipe.objects.with_user_flags(
+                self.request.user).defer('search_vector')
+        return Recipe.objects.all()
+
     def get_serializer_class(self):
         if self.action == 'create' or self.action == 'partial_update':
             return RecipeCreateSerializer
@@ -138,6 +186,90 @@ class RecipeViewSet(viewsets.ModelViewSet):
             raise exceptions.ValidationError(
                 {'errors': 'Рецепт не найден в списке'})
 
+    @transaction.atomic
+    def add_recipes_to_list(self, list_model, ids):
+        """Добавляет рецепты в список: одна проверка id и одна вставка.
+
+        Счетчики и список покупок меняются только для действительно
+        добавленных строк: рецепт, добавленный параллельным запросом, не
+        учитывается дважды.
+        """
+        user = self.request.user
+        found = set(Recipe.objects.filter(pk__in=ids).values_list(
+            'pk', flat=True))
+        added = list_model.objects.insert_new(
+            user.pk, [pk for pk in ids if pk in found])
+        model, _, field = COUNTERS[list_model]
+        change_counters(model, added, field, 1)
+        if list_model is ShoppingCart:
+            shopping_list.add(user.pk, added)
+        added = set(added)
+        return [
+            {'id': pk, 'status': 'not_found' if pk not in found
+             else 'added' if pk in added else 'exists'}
+            for pk in ids
+        ]
+
+    @transaction.atomic
+    def remove_recipes_from_list(self, list_model, ids=None):
+        """Удаляет рецепты из списка, без ids - все.
+
+        Строки блокируются до чтения, поэтому параллельное удаление тех
+        же рецептов ждет и не уменьшает счетчики повторно. Счетчики и
+        список покупок меняются здесь одним запросом, а не получателями
+        сигналов для каждой строки.
+        """
+        queryset = list_model.objects.filter(user=self.request.user)
+        if ids is not None:
+            queryset = queryset.filter(recipe_id__in=ids)
+        removed = list(queryset.select_for_update().values_list(
+            'recipe_id', flat=True))
+        if list_model is ShoppingCart:
+            shopping_list.remove(self.request.user.pk, removed)
+        with bulk():
+            queryset.filter(recipe_id__in=removed).delete()
+        model, _, field = COUNTERS[list_model]
+        change_counters(model, removed, field, -1)
+        if ids is None:
+            return [{'id': pk, 'status': 'removed'} for pk in removed]
+        removed = set(removed)
+        return [
+            {'id': pk,
+             'status': 'removed' if pk in removed else 'not_in_list'}
+            for pk in ids
+        ]
+
+    def change_list(self, request, list_model):
+        """Массовое изменение списка: POST и DELETE с {"recipes": [id]}.
+
+        DELETE без тела очищает корзину целиком; избранное так удаляется
+        только по списку id.
+        """
+        if (request.method == 'DELETE' and not request.data
+                and list_model is ShoppingCart):
+            return Response(
+                {'results': self.remove_recipes_from_list(list_model)})
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            results = self.add_recipes_to_list(list_model, ids)
+        else:
+            results = self.remove_recipes_from_list(list_model, ids)
+        return Response({'results': results})
+
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='favorite', url_name='favorite-bulk',
+            permission_classes=(IsAuthenticated,))
+    def favorite_bulk(self, request):
+        return self.change_list(request, Favorite)
+
+    @action(detail=False, methods=['post', 'delete'],
+            url_path='shopping_cart', url_name='shopping-cart-bulk',
+            permission_classes=(IsAuthenticated,))
+    def shopping_cart_bulk(self, request):
+        return self.change_list(request, ShoppingCart)
+
     @action(detail=True, methods=['post', 'delete'])
     def favorite(self, request, **kwargs):
         if request.method == 'POST':
@@ -167,22 +299,70 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 ShoppingCart
             )
 
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def feed(self, request):
+        """Рецепты авторов из подписок, новые первыми.
+
+        Обычно страница читается из ленты пользователя одним проходом по
+        индексу. Если среди подписок есть авторы, чьи рецепты в ленты не
+        копируются, их рецепты объединяются с лентой при чтении.
+        """
+        user = request.user
+        recipes = Recipe.objects.with_user_flags(user).defer('search_vector')
+        large_authors = list(User.objects.filter(
+            following__user=user,
+            followers_count__gt=settings.FEED_FANOUT_LIMIT,
+        ).values_list('pk', flat=True))
+        if large_authors:
+            paginator = FeedPagination()
+            page = paginator.paginate_queryset(recipes.filter(
+                Q(author_id__in=large_authors)
+                | Q(Exists(FeedEntry.objects.filter(
+                    user=user, recipe=OuterRef('pk'))))
+            ), request, self)
+        else:
+            paginator = FeedPagination(recipe_field='recipe_id')
+            entries = paginator.paginate_queryset(
+                FeedEntry.objects.filter(user=user).only(
+                    'recipe_id', 'pub_date'), request, self)
+            found = recipes.in_bulk([entry.recipe_id for entry in entries])
+            page = [found[entry.recipe_id] for entry in entries
+                    if entry.recipe_id in found]
+        serializer = RecipeSerializer(
+            page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, permission_classes=(IsAuthenticated,))
+    def shopping_list(self, request):
+        return Response([
+            {'id': item['ingredient_id'],
+             'name': item['ingredient__name'],
+             'measurement_unit': item['ingredient__measurement_unit'],
+             'amount': item['amount']}
+            for item in get_shopping_list(request.user)
+        ])
+
     @action(detail=False, methods=['get'],
-            permission_classes=(IsAuthenticated,))
+            permission_classes=(IsAuthenticated,),
+            renderer_classes=(PlainTextRenderer, CSVRenderer, JSONRenderer))
     def download_shopping_cart(self, request):
-        shopping_cart = ShoppingCart.objects.filter(user=self.request.user)
-        recipes = [item.recipe.id for item in shopping_cart]
-        recipeingredients_list = RecipeIngredients.objects.filter(
-            recipe__in=recipes).values('ingredient').annotate(
-            amount=Sum('amount'))
-        text = 'Список покупок:\n'
-        for item in recipeingredients_list:
-            ingredient = Ingredient.objects.get(pk=item['ingredient'])
-            amount = item['amount']
-            text += (f'{ingredient.name}, {amount} '
-                     f'{ingredient.measurement_unit}\n'
-                     )
-        response = HttpResponse(text, content_type="text/plain")
+        renderer = request.accepted_renderer
+        items = get_shopping_list(request.user).iterator()
+        response = StreamingHttpResponse(
+            SHOPPING_LIST_WRITERS[renderer.format](items),
+            content_type=f'{renderer.media_type}; charset=utf-8')
+        filename = os.path.splitext(settings.FILE_NAME)[0]
         response['Content-Disposition'] = (
-            'attachment; filename=shopping_cart.txt')
+            f'attachment; filename={filename}.{renderer.format}')
         return response
+
+
+class MetricsView(APIView):
+    """Метрики производительности в формате Prometheus."""
+    permission_classes = (IsAdminUser,)
+    renderer_classes = (PlainTextRenderer,)
+
+    def get(self, request):
+        return Response(
+            registry.export(),
+            content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,35 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator без COUNT(*) по большим таблицам.
+
+    Для списка без фильтров в PostgreSQL число строк берется из
+    статистики планировщика (pg_class.reltuples), если оно больше
+    ADMIN_COUNT_ESTIMATE_THRESHOLD; с фильтрами и в малых таблицах
+    считается точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if (isinstance(queryset, QuerySet) and not queryset.query.where
+                and connections[queryset.db].vendor == 'postgresql'):
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            if row and row[0] > settings.ADMIN_COUNT_ESTIMATE_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
+class LargeTableAdminMixin:
+    """Список объектов админки без подсчета всей таблицы."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
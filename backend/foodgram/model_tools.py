@@ -0,0 +1,20 @@
+class CounterFieldsMixin:
+    """Счетчики меняются только запросами с F() (recipes.counters).
+
+    Обычное сохранение существующей строки их не записывает: значения
+    в памяти могли устареть, и запись затерла бы изменения, сделанные
+    параллельно. Отложенные (deferred) поля тоже не записываются.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
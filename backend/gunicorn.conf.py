@@ -0,0 +1,13 @@
+import os
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+
+def worker_exit(server, worker):
+    from api.metrics import registry
+    registry.flush()
+
+
+def child_exit(server, worker):
+    from api.metrics import retire_worker
+    retire_worker(worker.pid)
@@ -1,5 +1,9 @@
 from django.contrib import admin
+from django.utils.html import format_html
 
+from foodgram.admin_tools import LargeTableAdminMixin
+from users.models import User
+from . import shopping_list
 from .models import (Favorite, Ingredient, Recipe, RecipeIngredients,
                      ShoppingCart, Tag)
 
@@ -7,6 +11,7 @@ from .models import (Favorite, Ingredient, Recipe, RecipeIngredients,
 class IngredientAdmin(admin.ModelAdmin):
     list_display = ('name', 'measurement_unit')
     search_fields = ('name',)
+    ordering = ('name',)
 
 
 class RecipeIngredientsInline(admin.TabularInline):
@@ -14,37 +19,119 @@ class RecipeIngredientsInline(admin.TabularInline):
     extra = 1
     fields = ['ingredient', 'amount']
     list_display = ['ingredient', 'amount']
+    autocomplete_fields = ('ingredient',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'recipe', 'ingredient')
 
-class RecipeIngredientsAdmin(admin.ModelAdmin):
+
+class RecipeIngredientsAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Изменения пересчитывают списки покупок тех, у кого рецепт в
+    корзине: сигналы для RecipeIngredients этого не делают."""
     list_display = ('recipe', 'ingredient', 'amount')
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
+
+    def save_model(self, request, obj, form, change):
+        recipe_ids = [obj.recipe_id]
+        if change and 'recipe' in form.changed_data:
+            recipe_ids.append(form.initial['recipe'])
+        with shopping_list.updating_recipes(recipe_ids):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        with shopping_list.updating_recipes([obj.recipe_id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        recipe_ids = list(queryset.values_list('recipe_id', flat=True))
+        with shopping_list.updating_recipes(recipe_ids):
+            super().delete_queryset(request, queryset)
 
 
 class TagAdmin(admin.ModelAdmin):
     list_display = ('name', 'color', 'slug')
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class AuthorFilter(admin.SimpleListFilter):
+    """Фильтр по автору без перечисления всех пользователей.
+
+    Автор выбирается ссылкой в колонке «Автор», в фильтре показан
+    только выбранный.
+    """
+    title = 'автор'
+    parameter_name = 'author'
+
+    def lookups(self, request, model_admin):
+        value = self.value()
+        if not value or not value.isdigit():
+            return []
+        return User.objects.filter(pk=value).values_list('pk', 'username')
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(author_id=value)
+        return queryset
+
+
+class RecipeAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     inlines = [RecipeIngredientsInline, ]
-    list_display = ('name', 'author', 'display_tags', 'is_favorited')
-    list_filter = ('name', 'author', 'tags')
+    list_display = ('name', 'display_author', 'display_tags', 'is_favorited')
+    list_filter = (AuthorFilter, 'tags')
+    list_select_related = ('author',)
     search_fields = ('name',)
+    autocomplete_fields = ('author',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer(
+            'search_vector').prefetch_related('tags')
+
+    def display_author(self, obj):
+        return format_html('<a href="?{}={}">{}</a>',
+                           AuthorFilter.parameter_name, obj.author_id,
+                           obj.author)
+    display_author.short_description = 'Автор'
 
     def display_tags(self, obj):
         return ', '.join([tag.name for tag in obj.tags.all()])
     display_tags.short_description = 'Теги'
 
     def is_favorited(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
     is_favorited.short_description = 'В избранном'
+    is_favorited.admin_order_field = 'favorites_count'
 
+    def save_related(self, request, form, formsets, change):
+        if not change:
+            return super().save_related(request, form, formsets, change)
+        with shopping_list.updating_recipe(form.instance):
+            super().save_related(request, form, formsets, change)
 
-class FavoriteAdmin(admin.ModelAdmin):
-    list_display = ('recipe', 'user')
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
 
 
-class ShoppingCartAdmin(admin.ModelAdmin):
+class UserRecipeListAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Записи только добавляются и удаляются: счетчики и списки покупок
+    меняют сигналы создания и удаления, а правка записи их бы обошла."""
     list_display = ('recipe', 'user')
+    list_select_related = ('recipe', 'user')
+    autocomplete_fields = ('recipe', 'user')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class FavoriteAdmin(UserRecipeListAdmin):
+    pass
+
+
+class ShoppingCartAdmin(UserRecipeListAdmin):
+    pass
 
 
 admin.site.register(Recipe, RecipeAdmin)
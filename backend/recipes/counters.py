@@ -0,0 +1,59 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import F
+
+from recipes.models import Favorite, Recipe, ShoppingCart
+from users.models import Subscription, User
+
+# Связь -> (модель со счетчиком, внешний ключ, поле счетчика).
+COUNTERS = {
+    Favorite: (Recipe, 'recipe_id', 'favorites_count'),
+    ShoppingCart: (Recipe, 'recipe_id', 'in_carts_count'),
+    Recipe: (User, 'author_id', 'recipes_count'),
+    Subscription: (User, 'author_id', 'followers_count'),
+}
+
+# Внутри bulk() получатели сигналов не меняют счетчики и списки покупок:
+# вызывающий код делает это сам одним запросом на все строки.
+in_bulk = ContextVar('recipes_in_bulk', default=False)
+
+
+@contextmanager
+def bulk():
+    token = in_bulk.set(True)
+    try:
+        yield
+    finally:
+        in_bulk.reset(token)
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счетчик на delta, не опуская его ниже нуля."""
+    change_counters(model, (pk,), field, delta)
+
+
+def change_counters(model, pks, field, delta):
+    """change_counter для нескольких объектов одним запросом.
+
+    Нужен для bulk_create и удаления без сигналов.
+    """
+    if not pks:
+        return
+    queryset = model.objects.filter(pk__in=pks)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def increment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not in_bulk.get():
+        model, key, field = COUNTERS[sender]
+        change_counter(model, getattr(instance, key), field, 1)
+
+
+def decrement(sender, instance, **kwargs):
+    if in_bulk.get():
+        return
+    model, key, field = COUNTERS[sender]
+    change_counter(model, getattr(instance, key), field, -1)
@@ -0,0 +1,74 @@
+from django.conf import settings
+from django.db import connection
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+
+def fill_timelines(recipe_id=None, user_id=None, author_id=None,
+                   limit=None):
+    """Копирует рецепты в ленты подписчиков одним INSERT ... SELECT.
+
+    Рецепты авторов, у которых подписчиков больше FEED_FANOUT_LIMIT, в
+    ленты не копируются: они подмешиваются при чтении. Без recipe_id
+    уже существующие записи пропускаются, limit ограничивает число
+    последних рецептов каждого автора.
+    """
+    entries = FeedEntry._meta.db_table
+    recipes = Recipe._meta.db_table
+    conditions = ['author.followers_count <= %s']
+    params = [settings.FEED_FANOUT_LIMIT]
+    for column, value in (('recipe.id', recipe_id),
+                          ('subscription.user_id', user_id),
+                          ('subscription.author_id', author_id)):
+        if value is not None:
+            conditions.append(f'{column} = %s')
+            params.append(value)
+    if recipe_id is None:
+        conditions.append(
+            f'NOT EXISTS (SELECT 1 FROM {entries} entry '
+            'WHERE entry.user_id = subscription.user_id '
+            'AND entry.recipe_id = recipe.id)')
+    if limit is not None:
+        conditions.append(
+            f'recipe.id IN (SELECT latest.id FROM {recipes} latest '
+            'WHERE latest.author_id = recipe.author_id '
+            'ORDER BY latest.pub_date DESC, latest.id DESC LIMIT %s)')
+        params.append(limit)
+    sql = (
+        f'INSERT INTO {entries} (user_id, recipe_id, author_id, pub_date) '
+        'SELECT subscription.user_id, recipe.id, recipe.author_id, '
+        'recipe.pub_date '
+        f'FROM {recipes} recipe '
+        f'JOIN {Subscription._meta.db_table} subscription '
+        'ON subscription.author_id = recipe.author_id '
+        f'JOIN {User._meta.db_table} author ON author.id = recipe.author_id '
+        'WHERE ' + ' AND '.join(conditions)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def fan_out(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fill_timelines(recipe_id=instance.pk)
+
+
+def follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        fill_timelines(user_id=instance.user_id,
+                       author_id=instance.author_id,
+                       limit=settings.FEED_BACKFILL_SIZE)
+
+
+def unfollow(sender, instance, **kwargs):
+    FeedEntry.objects.filter(
+        user_id=instance.user_id, author_id=instance.author_id).delete()
+    # Счетчик уже уменьшен: автор, опустившийся до FEED_FANOUT_LIMIT
+    # подписчиков, снова копирует рецепты в ленты, и его последние
+    # рецепты добавляются в ленты всех подписчиков.
+    if User.objects.filter(pk=instance.author_id,
+                           followers_count=settings.FEED_FANOUT_LIMIT
+                           ).exists():
+        fill_timelines(author_id=instance.author_id,
+                       limit=settings.FEED_BACKFILL_SIZE)
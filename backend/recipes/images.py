@@ -0,0 +1,96 @@
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+
+from recipes.models import Recipe
+
+# Вариант -> максимальный размер стороны в пикселях.
+VARIANTS = {
+    'thumbnail': 160,
+    'card': 740,
+}
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'progressive': True,
+             'optimize': True},
+}
+# Нечитаемый файл, неизвестный формат и слишком большое изображение.
+IMAGE_ERRORS = (OSError, ValueError, SyntaxError, Image.DecompressionBombError)
+
+
+def variant_name(source, variant, extension):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f'recipes/variants/{stem}_{variant}.{extension}'
+
+
+def variant_files(variants):
+    return {name for variant, files in variants.items()
+            if variant != 'source' for name in files.values()}
+
+
+def delete_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def to_rgb(image):
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(source):
+    """Уменьшенные копии изображения во всех вариантах и форматах.
+
+    Все копии готовятся в памяти и сохраняются только после этого,
+    чтобы ошибка Pillow не оставляла часть файлов.
+    """
+    with default_storage.open(source) as file:
+        original = to_rgb(Image.open(file))
+    rendered = {}
+    for variant, size in VARIANTS.items():
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        for extension, options in FORMATS.items():
+            buffer = io.BytesIO()
+            image.save(buffer, **options)
+            rendered[variant, extension] = buffer.getvalue()
+    variants = {variant: {} for variant in VARIANTS}
+    for (variant, extension), content in rendered.items():
+        variants[variant][extension] = default_storage.save(
+            variant_name(source, variant, extension), ContentFile(content))
+    return variants
+
+
+def generate_variants(recipe_id):
+    """Создает копии картинки рецепта и удаляет копии прежней картинки.
+
+    Возвращает False, если файл не читается: тогда копий у рецепта нет,
+    и повторно он не обрабатывается, пока картинку не заменят.
+    """
+    row = Recipe.objects.filter(pk=recipe_id).values_list(
+        'image', 'image_variants').first()
+    if row is None or not row[0]:
+        return False
+    source, previous = row
+    try:
+        variants = render_variants(source)
+        rendered = True
+    except IMAGE_ERRORS:
+        variants = {}
+        rendered = False
+    variants['source'] = source
+    updated = Recipe.objects.filter(pk=recipe_id, image=source).update(
+        image_variants=variants, image_pending=False)
+    if updated:
+        delete_files(variant_files(previous) - variant_files(variants))
+    else:
+        # Картинку заменили во время обработки: копии уже не нужны.
+        delete_files(variant_files(variants))
+    return rendered
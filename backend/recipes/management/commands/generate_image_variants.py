@@ -0,0 +1,55 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+from recipes.images import generate_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = ('Создание уменьшенных копий картинок рецептов. С --watch '
+            'работает как отдельный от веб-сервера обработчик.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать копии для всех рецептов.'
+        )
+        parser.add_argument(
+            '--watch', action='store_true',
+            help='Не завершаться: обрабатывать новые картинки по мере '
+                 'появления.'
+        )
+        parser.add_argument(
+            '--interval', type=float,
+            default=settings.IMAGE_WORKER_INTERVAL,
+            help='Пауза между проверками в режиме --watch, секунд.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='').order_by('pk')
+        if options['all']:
+            self.process(recipes)
+        while True:
+            processed = self.process(recipes.filter(image_pending=True))
+            if not options['watch']:
+                return
+            if not processed:
+                close_old_connections()
+                time.sleep(options['interval'])
+
+    def process(self, recipes):
+        processed = failed = 0
+        for recipe_id in list(recipes.values_list('pk', flat=True)):
+            if generate_variants(recipe_id):
+                processed += 1
+            else:
+                failed += 1
+                self.stdout.write(self.style.WARNING(
+                    f'Не удалось обработать картинку рецепта {recipe_id}'))
+        if processed or failed:
+            self.stdout.write(self.style.SUCCESS(
+                f'Обработано рецептов: {processed}, с ошибками: {failed}'))
+        return processed + failed
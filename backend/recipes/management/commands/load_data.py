@@ -1,25 +1,167 @@
 import csv
+import io
+import json
+import os
+import re
+from itertools import islice
 
 from django.conf import settings
-from django.core.management import BaseCommand
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
 
-from recipes.models import Ingredient
+from api.cache import bump_version
+from api.search import ingredient_index
+from recipes.models import Ingredient, Tag
+
+JSON_CHUNK_SIZE = 64 * 1024
+JSON_SEPARATORS = re.compile(r'[ \t\r\n,]*')
+
+
+def read_csv(file, fields):
+    for row in csv.reader(file, delimiter=','):
+        yield dict(zip(fields, row))
+
+
+def read_json(file, fields):
+    """Потоковое чтение JSON-массива объектов без загрузки файла целиком.
+
+    Объекты разбираются по смещению в буфере; прочитанная часть
+    отбрасывается только при дозагрузке следующего блока.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив объектов.')
+    position = 1
+    while True:
+        position = JSON_SEPARATORS.match(buffer, position).end()
+        if buffer.startswith(']', position):
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON-файл.')
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield {field: item.get(field, '') for field in fields}
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
+def clean(value):
+    return '' if value is None else str(value).strip()
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
 
 
 class Command(BaseCommand):
+    help = 'Загрузка ингредиентов и тегов из CSV или JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help='Файл ингредиентов (.csv или .json).'
+        )
+        parser.add_argument(
+            '--tags',
+            help='Файл тегов (.csv или .json) с полями name, color, slug.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество строк в одной вставке.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только прочитать и проверить файлы, не записывая в БД.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        self.batch_size = options['batch_size']
+        self.dry_run = options['dry_run']
+        if options['ingredients']:
+            self.load(options['ingredients'], Ingredient,
+                      ('name', 'measurement_unit'),
+                      self.insert_ingredients)
+        if options['tags']:
+            self.load(options['tags'], Tag, ('name', 'color', 'slug'),
+                      self.insert_objects)
+        if not self.dry_run:
+            # Массовая вставка идет в обход сигналов: кэш ответов
+            # справочников и индекс ингредиентов сбрасываются явно.
+            bump_version(Ingredient)
+            bump_version(Tag)
+            ingredient_index.invalidate()
+        self.stdout.write(self.style.SUCCESS('Данные успешно загружены.'))
+
+    def load(self, path, model, fields, insert):
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError(f'Неподдерживаемый формат файла: {path}')
+        name = model._meta.verbose_name_plural
+        before = model.objects.count()
+        total = skipped = 0
+        with open(path, 'r', encoding='utf-8') as file:
+            for batch in batches(reader(file, fields), self.batch_size):
+                total += len(batch)
+                # Короткие и пустые строки, как и дубликаты, считаются
+                # пропущенными.
+                rows = {
+                    tuple(clean(row.get(field)) for field in fields)
+                    for row in batch
+                }
+                rows = [row for row in rows if all(row)]
+                skipped += len(batch) - len(rows)
+                if not self.dry_run:
+                    insert(model, fields, rows)
+                self.stdout.write(f'{name}: обработано строк {total}')
+        created = model.objects.count() - before
+        self.stdout.write(
+            f'{name}: прочитано {total}, пропущено {skipped}, '
+            f'добавлено {created}'
+            + (' (пробный запуск)' if self.dry_run else '')
+        )
+
+    def insert_objects(self, model, fields, rows):
+        model.objects.bulk_create(
+            (model(**dict(zip(fields, row))) for row in rows),
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
 
-    def handle(self, *args, **kwargs):
-        data_path = settings.BASE_DIR
-        with open(f'{data_path}/data/ingredients.csv',
-                  'r', encoding='utf-8') as file:
-            csv_reader = csv.reader(file, delimiter=',')
-            for row in csv_reader:
-                _, created = Ingredient.objects.get_or_create(
-                    name=row[0],
-                    defaults={'measurement_unit': row[1]}
-                )
-                if created:
-                    self.stdout.write(f'Создан игредиент: {row[0]}')
-                else:
-                    self.stdout.write(f'Ингредиент {row[0]} уже существует')
-            self.stdout.write(self.style.SUCCESS('Данные успешно загружены.'))
+    def insert_ingredients(self, model, fields, rows):
+        if connection.vendor != 'postgresql':
+            return self.insert_objects(model, fields, rows)
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMP TABLE ingredient_import '
+                '(name varchar(200), measurement_unit varchar(200)) '
+                'ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import FROM STDIN WITH (FORMAT csv)', buffer)
+            cursor.execute(
+                f'INSERT INTO {model._meta.db_table} '
+                '(name, measurement_unit) '
+                'SELECT name, measurement_unit FROM ingredient_import '
+                'ON CONFLICT ON CONSTRAINT name_measurement_unit DO NOTHING'
+            )
@@ -0,0 +1,22 @@
+from django.core.management import BaseCommand
+
+from recipes.feed import fill_timelines
+from recipes.models import FeedEntry
+
+
+class Command(BaseCommand):
+    help = 'Заполнение лент подписок по текущим подпискам и рецептам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Удалить ленты перед заполнением.'
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            FeedEntry.objects.all().delete()
+        before = FeedEntry.objects.count()
+        fill_timelines()
+        self.stdout.write(self.style.SUCCESS(
+            f'Добавлено записей: {FeedEntry.objects.count() - before}'))
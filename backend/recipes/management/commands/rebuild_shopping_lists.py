@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from recipes.models import ShoppingListItem
+from recipes.shopping_list import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересборка списков покупок по корзинам пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', type=int,
+            help='id пользователя; по умолчанию все пользователи.'
+        )
+
+    def handle(self, *args, **options):
+        rebuild(options['user'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Строк в списках покупок: {ShoppingListItem.objects.count()}'))
@@ -0,0 +1,60 @@
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.counters import COUNTERS
+
+
+def count_of(model, key):
+    return Coalesce(Subquery(
+        model.objects.filter(**{key: OuterRef('pk')}).order_by().values(
+            key).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков избранного, корзин, рецептов и подписчиков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество объектов, проверяемых за один запрос.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        targets = {}
+        for relation, (model, key, field) in COUNTERS.items():
+            targets.setdefault(model, {})[field] = count_of(relation, key)
+        for model, counters in targets.items():
+            fixed = self.recount(model, counters, options['batch_size'])
+            self.stdout.write(
+                f'{model._meta.verbose_name_plural}: исправлено {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны.'))
+
+    def recount(self, model, counters, batch_size):
+        fields = list(counters)
+        actual = {f'actual_{field}': count for field, count
+                  in counters.items()}
+        fixed = 0
+        last_pk = 0
+        while True:
+            batch = list(model.objects.filter(pk__gt=last_pk).order_by(
+                'pk').annotate(**actual).only('pk', *fields)[:batch_size])
+            if not batch:
+                return fixed
+            last_pk = batch[-1].pk
+            drifted = []
+            for obj in batch:
+                changed = False
+                for field in fields:
+                    value = getattr(obj, f'actual_{field}')
+                    if getattr(obj, field) != value:
+                        setattr(obj, field, value)
+                        changed = True
+                if changed:
+                    drifted.append(obj)
+            if drifted:
+                model.objects.bulk_update(drifted, fields)
+            fixed += len(drifted)
@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def mark_pending(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    pending = [
+        pk for pk, image, variants in Recipe.objects.exclude(
+            image='').values_list('pk', 'image', 'image_variants').iterator()
+        if variants.get('source') != image
+    ]
+    for start in range(0, len(pending), 1000):
+        Recipe.objects.filter(pk__in=pending[start:start + 1000]).update(
+            image_pending=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_pending',
+            field=models.BooleanField(db_index=True, default=False, editable=False, verbose_name='копии картинки не готовы'),
+        ),
+        migrations.RunPython(mark_pending, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,16 @@
 from colorfield.fields import ColorField
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
 from django.core.validators import (MaxValueValidator, MinValueValidator,
                                     RegexValidator)
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import connections, models
+from django.db.models import (Case, Exists, F, OuterRef, Prefetch, Q,
+                              UniqueConstraint, Value, When, Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 
-from users.models import User
+from foodgram.model_tools import CounterFieldsMixin
+from users.models import Subscription, User
 
 
 class Tag(models.Model):
@@ -62,7 +68,91 @@ class Ingredient(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        """Автор, теги и ингредиенты рецепта фиксированным числом запросов."""
+        queryset = self.select_related('author').defer('search_vector')
+        return queryset.prefetch_related(
+            'tags',
+            Prefetch(
+                'recipeingredients',
+                queryset=RecipeIngredients.objects.select_related(
+                    'ingredient')
+            )
+        )
+
+    def with_user_flags(self, user):
+        """Признаки избранного, корзины и подписки на автора."""
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            is_author_subscribed=Exists(Subscription.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+
+    def latest_per_author(self, limit):
+        """Не более limit последних рецептов каждого автора."""
+        ranked = self.annotate(recipe_rank=Window(
+            expression=RowNumber(),
+            partition_by=F('author'),
+            order_by=F('pub_date').desc(),
+        )).order_by().values('pk', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(pk__in=RawSQL(
+            f'SELECT ranked.id FROM ({sql}) ranked '
+            'WHERE ranked.recipe_rank <= %s',
+            (*params, limit)
+        ))
+
+    def search(self, query):
+        """Полнотекстовый поиск по названию и описанию с ранжированием.
+
+        В PostgreSQL используется search_vector с GIN-индексом, который
+        заполняет триггер (название весомее описания). В SQLite -
+        таблица FTS5 recipes_recipe_fts с триггерами: каждое слово ищется
+        как префикс, ранжирование по bm25. В остальных СУБД индекса нет:
+        каждое слово ищется через icontains полным просмотром таблицы, а
+        рецепты с совпадением в названии идут первыми.
+        """
+        vendor = connections[self.db].vendor
+        if vendor == 'postgresql':
+            search_query = SearchQuery(
+                query, config='russian', search_type='websearch')
+            return self.filter(search_vector=search_query).annotate(
+                search_rank=SearchRank(F('search_vector'), search_query)
+            ).order_by('-search_rank', '-pub_date', '-id')
+        words = query.split()
+        if not words:
+            return self
+        if vendor == 'sqlite':
+            match = ' '.join(
+                '"{}"*'.format(word.replace('"', '""')) for word in words)
+            return self.filter(id__in=RawSQL(
+                'SELECT rowid FROM recipes_recipe_fts '
+                'WHERE recipes_recipe_fts MATCH %s', (match,),
+            )).annotate(search_rank=RawSQL(
+                '(SELECT -bm25(recipes_recipe_fts, 10.0, 1.0) '
+                'FROM recipes_recipe_fts '
+                'WHERE recipes_recipe_fts MATCH %s '
+                'AND rowid = recipes_recipe.id)', (match,),
+            )).order_by('-search_rank', '-pub_date', '-id')
+        condition = Q()
+        in_name = Q()
+        for word in words:
+            condition &= Q(name__icontains=word) | Q(text__icontains=word)
+            in_name &= Q(name__icontains=word)
+        return self.filter(condition).annotate(search_rank=Case(
+            When(in_name, then=Value(1.0)),
+            default=Value(0.0),
+        )).order_by('-search_rank', '-pub_date', '-id')
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -83,6 +173,17 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='картинка'
     )
+    image_variants = models.JSONField(
+        verbose_name='уменьшенные копии картинки',
+        default=dict,
+        editable=False,
+    )
+    image_pending = models.BooleanField(
+        verbose_name='копии картинки не готовы',
+        default=False,
+        editable=False,
+        db_index=True,
+    )
     pub_date = models.DateTimeField(
         verbose_name='Дата публикации рецепта',
         auto_now_add=True,
@@ -99,15 +200,50 @@ class Recipe(models.Model):
                     message='Минимальное время приготовления 1 минута'),),
         verbose_name='время приготовления (в минутах)',
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='в избранном',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='в списках покупок',
+        default=0,
+        editable=False,
+    )
+    counter_fields = ('favorites_count', 'in_carts_count')
+    search_vector = SearchVectorField(
+        verbose_name='поисковый вектор',
+        null=True,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Отмечает новую картинку для generate_image_variants --watch."""
+        update_fields = kwargs.get('update_fields')
+        if (self.image
+                and self.image.name != self.image_variants.get('source')
+                and (update_fields is None or 'image' in update_fields)):
+            self.image_pending = True
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'image_pending'}
+        super().save(*args, **kwargs)
+
 
 class RecipeIngredients(models.Model):
     recipe = models.ForeignKey(
@@ -137,6 +273,30 @@ class RecipeIngredients(models.Model):
         return f'{self.recipe} {self.ingredient}'
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    """Строки избранного и корзины: пара пользователь - рецепт."""
+
+    def insert_new(self, user_id, recipe_ids):
+        """Добавляет рецепты одним INSERT ... ON CONFLICT DO NOTHING.
+
+        Возвращает id только действительно добавленных рецептов: строки,
+        вставленные параллельным запросом, в результат не попадают.
+        Сигналы post_save не отправляются.
+        """
+        if not recipe_ids:
+            return []
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.model._meta.db_table} '
+                '(user_id, recipe_id) VALUES '
+                + ', '.join(['(%s, %s)'] * len(recipe_ids))
+                + ' ON CONFLICT (user_id, recipe_id) DO NOTHING '
+                'RETURNING recipe_id',
+                [value for pk in recipe_ids for value in (user_id, pk)]
+            )
+            return [pk for pk, in cursor.fetchall()]
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
@@ -151,6 +311,8 @@ class Favorite(models.Model):
         verbose_name='Рецепт',
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+
     class Meta:
         ordering = ['-id']
         verbose_name = 'Избранное'
@@ -180,6 +342,8 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
     )
 
+    objects = UserRecipeQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Список покупок'
@@ -193,3 +357,77 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.recipe} в корзине у {self.user}'
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента по рецептам в корзине."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField(
+        verbose_name='Количество',
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Списки покупок по ингредиентам'
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_list_item'
+            ),
+        )
+
+    def __str__(self):
+        return f'{self.ingredient} {self.amount} у {self.user}'
+
+
+class FeedEntry(models.Model):
+    """Запись ленты подписок: рецепт автора у одного подписчика."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = (
+            UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_entry'
+            ),
+        )
+        indexes = (
+            models.Index(fields=['user', '-pub_date', '-recipe'],
+                         name='feed_user_pub_date_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
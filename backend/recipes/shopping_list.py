@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+from recipes.counters import in_bulk
+from recipes.models import RecipeIngredients, ShoppingCart, ShoppingListItem
+
+
+def shift(sign, user_id=None, recipe_ids=None):
+    """Прибавляет (sign = 1) или вычитает (sign = -1) ингредиенты рецептов
+    из корзин в списках покупок одним INSERT ... ON CONFLICT.
+
+    Учитываются только рецепты, которые сейчас лежат в корзине: при
+    удалении функцию вызывают до удаления строки ShoppingCart. Строки с
+    нулевым количеством остаются до clean() и не выводятся.
+    """
+    items = ShoppingListItem._meta.db_table
+    conditions = []
+    params = []
+    if user_id is not None:
+        conditions.append('cart.user_id = %s')
+        params.append(user_id)
+    if recipe_ids is not None:
+        if not recipe_ids:
+            return
+        conditions.append(
+            'cart.recipe_id IN ({})'.format(', '.join(['%s'] * len(
+                recipe_ids))))
+        params.extend(recipe_ids)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {items} (user_id, ingredient_id, amount) '
+            'SELECT cart.user_id, item.ingredient_id, '
+            f'{"-" if sign < 0 else ""}SUM(item.amount) '
+            f'FROM {ShoppingCart._meta.db_table} cart '
+            f'JOIN {RecipeIngredients._meta.db_table} item '
+            'ON item.recipe_id = cart.recipe_id '
+            'WHERE ' + (' AND '.join(conditions) or 'TRUE') + ' '
+            'GROUP BY cart.user_id, item.ingredient_id '
+            'ON CONFLICT (user_id, ingredient_id) '
+            f'DO UPDATE SET amount = {items}.amount + EXCLUDED.amount',
+            params
+        )
+
+
+def clean(user_id):
+    ShoppingListItem.objects.filter(user_id=user_id, amount__lte=0).delete()
+
+
+def add(user_id, recipe_ids):
+    shift(1, user_id=user_id, recipe_ids=recipe_ids)
+
+
+def remove(user_id, recipe_ids=None):
+    """Вызывается до удаления рецептов из корзины."""
+    shift(-1, user_id=user_id, recipe_ids=recipe_ids)
+    clean(user_id)
+
+
+@contextmanager
+def updating_recipes(recipe_ids):
+    """Пересчет списков покупок при изменении ингредиентов рецептов,
+    которые лежат в корзинах: вычесть до изменения, прибавить после."""
+    in_carts = list(ShoppingCart.objects.filter(
+        recipe_id__in=set(recipe_ids)).values_list(
+            'recipe_id', flat=True).distinct())
+    if not in_carts:
+        yield
+        return
+    shift(-1, recipe_ids=in_carts)
+    yield
+    shift(1, recipe_ids=in_carts)
+
+
+def updating_recipe(recipe):
+    return updating_recipes([recipe.pk])
+
+
+@transaction.atomic
+def rebuild(user_id=None):
+    """Пересобирает списки покупок по корзинам."""
+    items = ShoppingListItem.objects.all()
+    if user_id is not None:
+        items = items.filter(user_id=user_id)
+    items.delete()
+    shift(1, user_id=user_id)
+
+
+def cart_added(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and not in_bulk.get():
+        add(instance.user_id, [instance.recipe_id])
+
+
+def cart_removed(sender, instance, **kwargs):
+    if not in_bulk.get():
+        remove(instance.user_id, [instance.recipe_id])
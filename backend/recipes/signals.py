@@ -0,0 +1,36 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from recipes.counters import COUNTERS, decrement, increment
+from recipes.feed import fan_out, follow, unfollow
+from recipes.images import delete_files, variant_files
+from recipes.models import Recipe, ShoppingCart
+from recipes.shopping_list import cart_added, cart_removed
+from users.models import Subscription
+
+for sender in COUNTERS:
+    post_save.connect(increment, sender=sender,
+                      dispatch_uid=f'{sender.__name__}_counter_increment')
+    post_delete.connect(decrement, sender=sender,
+                        dispatch_uid=f'{sender.__name__}_counter_decrement')
+
+post_save.connect(fan_out, sender=Recipe, dispatch_uid='recipe_feed_fan_out')
+post_save.connect(follow, sender=Subscription,
+                  dispatch_uid='subscription_feed_follow')
+post_delete.connect(unfollow, sender=Subscription,
+                    dispatch_uid='subscription_feed_unfollow')
+post_save.connect(cart_added, sender=ShoppingCart,
+                  dispatch_uid='shopping_cart_list_add')
+# До удаления: при каскадном удалении рецепта его ингредиенты еще есть.
+pre_delete.connect(cart_removed, sender=ShoppingCart,
+                   dispatch_uid='shopping_cart_list_remove')
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_recipe_variants(sender, instance, **kwargs):
+    """Копии картинки удаленного рецепта; сами копии создает
+    generate_image_variants --watch."""
+    names = variant_files(instance.image_variants)
+    if names:
+        transaction.on_commit(lambda: delete_files(names))
@@ -0,0 +1,83 @@
+import pytest
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api import cache as response_cache
+from api.metrics import registry
+from api.search import ingredient_index
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredients,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+
+@pytest.fixture(autouse=True)
+def isolated_settings(settings, tmp_path, monkeypatch):
+    """Свой локальный кэш, метрики и временные каталоги для каждого
+    теста."""
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': str(tmp_path),
+    }}
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    settings.METRICS_DIR = str(tmp_path / 'metrics')
+    settings.DATABASE_REPLICAS = []
+    monkeypatch.setattr(registry, 'views', {})
+    monkeypatch.setattr(registry, 'cache', {})
+    monkeypatch.setattr(response_cache, 'local_versions', {})
+    ingredient_index.invalidate()
+
+
+@pytest.fixture
+def user(django_user_model):
+    return django_user_model.objects.create_user(
+        username='user', email='user@foodgram.ru', password='Pa55word-1',
+        first_name='Имя', last_name='Фамилия')
+
+
+@pytest.fixture
+def user_client(user):
+    client = APIClient()
+    token = Token.objects.create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def anon_client():
+    return APIClient()
+
+
+@pytest.fixture
+def recipes(user):
+    """Рецепты нескольких авторов с тегами и ингредиентами; часть из
+    них в избранном и в корзине пользователя."""
+    authors = [
+        User.objects.create(username=f'author{i}',
+                            email=f'author{i}@foodgram.ru',
+                            first_name='Автор', last_name='Фамилия')
+        for i in range(3)]
+    tags = [
+        Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                           slug=f'tag{i}')
+        for i in range(3)]
+    ingredients = [
+        Ingredient.objects.create(name=f'ингредиент {i}',
+                                  measurement_unit='г')
+        for i in range(10)]
+    recipes = []
+    for i in range(12):
+        recipe = Recipe.objects.create(
+            author=authors[i % len(authors)], name=f'Рецепт {i}',
+            text='Описание', cooking_time=10, image='recipes/test.png')
+        recipe.tags.set(tags[:1 + i % len(tags)])
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe, ingredient=ingredient,
+                              amount=i + 1)
+            for ingredient in ingredients[i % 5:i % 5 + 5])
+        recipes.append(recipe)
+    for recipe in recipes[::2]:
+        Favorite.objects.create(user=user, recipe=recipe)
+    for recipe in recipes[::3]:
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    Subscription.objects.create(user=user, author=authors[0])
+    return recipes
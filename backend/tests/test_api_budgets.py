@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from api.benchmark import (BASELINE, SCENARIOS, SKIPPED, perform,
+                           reachable_routes, seed)
+
+SIZE_TOLERANCE = 0.1
+
+with open(BASELINE, encoding='utf-8') as file:
+    BUDGETS = json.load(file)
+
+
+@pytest.fixture
+def state(transactional_db):
+    """Данные сценариев в объемах базовой линии. Без общей транзакции
+    теста: иначе atomic() в представлениях добавляет SAVEPOINT к числу
+    запросов, которого нет в benchmark_api и в работе сервиса."""
+    return seed(**BUDGETS['volumes'])
+
+
+def test_every_route_has_scenario():
+    covered = {step.route for steps in SCENARIOS for step in steps}
+    assert reachable_routes() - SKIPPED - covered == set()
+
+
+@pytest.mark.parametrize('steps', SCENARIOS,
+                         ids=[steps[0].key for steps in SCENARIOS])
+def test_scenario_within_budget(state, steps):
+    # Первый прогон прогревает кэши, как в benchmark_api.
+    for attempt in range(2):
+        state['counter'] += 1
+        for step in steps:
+            result = perform(step, state)
+            assert result.status == step.status, (
+                f'{step.key}: {result.path} {result.content[:300]!r}')
+            if not attempt:
+                continue
+            budget = BUDGETS['routes'][step.key]
+            assert result.queries <= budget['queries'], step.key
+            assert (len(result.content)
+                    <= budget['bytes'] * (1 + SIZE_TOLERANCE)), step.key
@@ -0,0 +1,27 @@
+import pytest
+
+pytestmark = pytest.mark.django_db
+
+
+def rename_ingredient(recipe):
+    ingredient = recipe.recipeingredients.first().ingredient
+    ingredient.name = 'переименован'
+    ingredient.save()
+
+
+def rename_author(recipe):
+    author = recipe.author
+    author.first_name = 'переименован'
+    author.save()
+
+
+@pytest.mark.parametrize('rename', (rename_ingredient, rename_author))
+def test_rename_resets_cached_recipe(anon_client, recipes, rename,
+                                     django_capture_on_commit_callbacks):
+    url = f'/api/recipes/{recipes[0].pk}/'
+    assert anon_client.get(url)['X-Cache'] == 'MISS'
+    with django_capture_on_commit_callbacks(execute=True):
+        rename(recipes[0])
+    response = anon_client.get(url)
+    assert response['X-Cache'] == 'MISS'
+    assert 'переименован' in response.content.decode()
@@ -0,0 +1,35 @@
+import pytest
+
+from api.cache import bump_version, get_version
+from recipes.models import Ingredient
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def unreachable_cache(settings):
+    """memcached, который не отвечает: ошибки игнорируются, как в
+    настройках по умолчанию."""
+    settings.CACHES = {'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': '127.0.0.1:9',
+        'OPTIONS': {'ignore_exc': True, 'connect_timeout': 0.1,
+                    'timeout': 0.1},
+    }}
+
+
+def test_version_is_kept_in_process(unreachable_cache):
+    version = get_version(Ingredient)
+    assert get_version(Ingredient) == version
+    bump_version(Ingredient)
+    assert get_version(Ingredient) != version
+
+
+def test_ingredient_index_is_not_rebuilt(unreachable_cache, anon_client,
+                                         django_assert_num_queries):
+    Ingredient.objects.create(name='соль', measurement_unit='г')
+    assert anon_client.get('/api/ingredients/?name=со').json()[0][
+        'name'] == 'соль'
+    with django_assert_num_queries(0):
+        response = anon_client.get('/api/ingredients/?name=сол')
+    assert response.json()[0]['name'] == 'соль'
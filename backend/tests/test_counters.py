@@ -0,0 +1,59 @@
+import pytest
+
+from api.benchmark import IMAGE
+from api.views import RecipeViewSet
+from recipes.models import Favorite, Recipe, RecipeIngredients, ShoppingCart
+from users.models import User
+
+pytestmark = pytest.mark.django_db
+
+
+def test_patch_keeps_concurrent_favorite(user, user_client, recipes,
+                                         monkeypatch):
+    recipe = recipes[1]
+    recipe.author = user
+    recipe.save()
+    other = User.objects.create(username='other', email='other@foodgram.ru')
+    get_object = RecipeViewSet.get_object
+
+    def get_object_then_favorite(view):
+        instance = get_object(view)
+        Favorite.objects.create(user=other, recipe=instance)
+        ShoppingCart.objects.create(user=other, recipe=instance)
+        return instance
+
+    monkeypatch.setattr(RecipeViewSet, 'get_object', get_object_then_favorite)
+    before = Recipe.objects.get(pk=recipe.pk)
+    response = user_client.patch(f'/api/recipes/{recipe.pk}/', {
+        'ingredients': [
+            {'id': item.ingredient_id, 'amount': 7}
+            for item in RecipeIngredients.objects.filter(recipe=recipe)],
+        'tags': [tag.pk for tag in recipe.tags.all()],
+        'image': IMAGE, 'name': 'Новое название', 'text': 'Описание',
+        'cooking_time': 5,
+    }, format='json')
+    assert response.status_code == 200
+    recipe.refresh_from_db()
+    assert recipe.name == 'Новое название'
+    assert recipe.favorites_count == before.favorites_count + 1
+    assert recipe.in_carts_count == before.in_carts_count + 1
+
+
+def test_user_save_keeps_counters(user, recipes):
+    author = recipes[0].author
+    stale = User.objects.get(pk=author.pk)
+    author.following.create(user=User.objects.create(
+        username='follower', email='follower@foodgram.ru'))
+    stale.first_name = 'Другое'
+    stale.save()
+    author.refresh_from_db()
+    assert author.first_name == 'Другое'
+    assert author.followers_count == stale.followers_count + 1
+
+
+def test_insert_new_returns_only_added_recipes(user, recipes):
+    existing = Favorite.objects.filter(user=user).first().recipe_id
+    fresh = recipes[1].pk
+    added = Favorite.objects.insert_new(user.pk, [existing, fresh])
+    assert added == [fresh]
+    assert Favorite.objects.filter(user=user, recipe_id=fresh).count() == 1
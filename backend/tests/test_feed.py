@@ -0,0 +1,50 @@
+import pytest
+from django.utils import timezone
+
+from recipes.models import FeedEntry, Recipe
+from users.models import Subscription, User
+
+pytestmark = pytest.mark.django_db
+
+
+def result_ids(response):
+    assert response.status_code == 200
+    return [recipe['id'] for recipe in response.json()['results']]
+
+
+def test_cursor_survives_feed_mode_change(user, user_client, recipes,
+                                          settings):
+    for author in {recipe.author for recipe in recipes}:
+        Subscription.objects.get_or_create(user=user, author=author)
+    # Одна дата у всех рецептов: порядок задает только id.
+    now = timezone.now()
+    Recipe.objects.update(pub_date=now)
+    FeedEntry.objects.update(pub_date=now)
+    first = user_client.get('/api/recipes/feed/')
+    settings.FEED_FANOUT_LIMIT = 0
+    second = user_client.get(first.json()['next'])
+    ids = result_ids(first) + result_ids(second)
+    assert ids == sorted((recipe.pk for recipe in recipes), reverse=True)
+    settings.FEED_FANOUT_LIMIT = 10000
+    previous = user_client.get(second.json()['previous'])
+    assert result_ids(previous) == result_ids(first)
+
+
+def test_invalid_feed_cursor(user_client):
+    response = user_client.get('/api/recipes/feed/?cursor=cD0x')
+    assert response.status_code == 404
+
+
+def test_author_below_fanout_limit_is_backfilled(user, settings):
+    settings.FEED_FANOUT_LIMIT = 1
+    author = User.objects.create(username='author', email='a@foodgram.ru')
+    other = User.objects.create(username='other', email='o@foodgram.ru')
+    Subscription.objects.create(user=user, author=author)
+    subscription = Subscription.objects.create(user=other, author=author)
+    recipe = Recipe.objects.create(
+        author=author, name='Рецепт', text='Описание', cooking_time=10,
+        image='recipes/test.png')
+    assert not FeedEntry.objects.filter(recipe=recipe).exists()
+    subscription.delete()
+    assert list(FeedEntry.objects.filter(recipe=recipe).values_list(
+        'user_id', flat=True)) == [user.pk]
@@ -0,0 +1,29 @@
+import pytest
+
+from recipes.models import Ingredient
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def ingredients(settings):
+    settings.INGREDIENT_SEARCH_LIMIT = 2
+    return [Ingredient.objects.create(name=f'соль {i}', measurement_unit='г')
+            for i in range(3)]
+
+
+def test_empty_name_lists_all_ingredients(anon_client, ingredients):
+    response = anon_client.get('/api/ingredients/?name=')
+    assert response.status_code == 200
+    assert len(response.json()) == len(ingredients)
+
+
+@pytest.mark.parametrize('limit, count', (
+    ('', 2),
+    ('0', 0),
+    ('3', 3),
+))
+def test_search_limit(anon_client, ingredients, limit, count):
+    response = anon_client.get(f'/api/ingredients/?name=со&limit={limit}')
+    assert response.status_code == 200
+    assert len(response.json()) == count
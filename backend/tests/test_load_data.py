@@ -0,0 +1,19 @@
+import io
+
+import pytest
+from django.core.management import call_command
+
+from recipes.models import Ingredient
+
+pytestmark = pytest.mark.django_db
+
+
+def test_malformed_rows_are_skipped(tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('мука,г\nсоль\n\n,мл\nсахар,г\nмука,г\n',
+                    encoding='utf-8')
+    out = io.StringIO()
+    call_command('load_data', ingredients=str(path), stdout=out)
+    loaded = Ingredient.objects.values_list('name', 'measurement_unit')
+    assert set(loaded) == {('мука', 'г'), ('сахар', 'г')}
+    assert 'прочитано 6, пропущено 4, добавлено 2' in out.getvalue()
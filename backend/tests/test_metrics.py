@@ -0,0 +1,10 @@
+import pytest
+
+pytestmark = pytest.mark.django_db
+
+
+def test_server_timing_reports_handler_time_as_app(anon_client, recipes):
+    response = anon_client.get('/api/recipes/')
+    names = [part.split(';')[0].strip()
+             for part in response['Server-Timing'].split(',')]
+    assert names == ['db', 'app', 'render', 'total']
@@ -0,0 +1,67 @@
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+
+from api.fragments import VERSION_KEY, get_fragments, get_versions
+from api.serializers import RecipeSerializer
+from recipes.models import Recipe, RecipeIngredients
+
+pytestmark = pytest.mark.django_db
+
+PAGE_SIZE = settings.REST_FRAMEWORK['PAGE_SIZE']
+
+# Бюджеты при пустом кэше не зависят от числа рецептов на странице:
+# авторы, теги, ингредиенты и отметки пользователя читаются пакетно.
+
+
+@pytest.mark.parametrize('client_name, budget', (
+    ('anon_client', 5),
+    ('user_client', 6),
+))
+def test_recipe_list_queries(request, recipes, client_name, budget,
+                             django_assert_max_num_queries):
+    client = request.getfixturevalue(client_name)
+    with django_assert_max_num_queries(budget):
+        response = client.get('/api/recipes/')
+    assert response.status_code == 200
+    assert len(response.json()['results']) == PAGE_SIZE
+
+
+@pytest.mark.parametrize('client_name, budget', (
+    ('anon_client', 4),
+    ('user_client', 5),
+))
+def test_recipe_detail_queries(request, recipes, client_name, budget,
+                               django_assert_max_num_queries):
+    client = request.getfixturevalue(client_name)
+    with django_assert_max_num_queries(budget):
+        response = client.get(f'/api/recipes/{recipes[0].pk}/')
+    assert response.status_code == 200
+    assert len(response.json()['ingredients']) == 5
+
+
+def test_cached_recipe_list_skips_database(anon_client, recipes,
+                                           django_assert_num_queries):
+    anon_client.get('/api/recipes/')
+    with django_assert_num_queries(0):
+        response = anon_client.get('/api/recipes/')
+    assert response['X-Cache'] == 'HIT'
+
+
+def test_stale_recipe_is_not_cached_under_new_version(recipes):
+    stale = Recipe.objects.with_related().get(pk=recipes[0].pk)
+    item = RecipeIngredients.objects.filter(recipe=stale).first()
+    RecipeIngredients.objects.filter(pk=item.pk).update(amount=999)
+    cache.delete(VERSION_KEY.format(stale.pk))
+    RecipeSerializer(stale).data
+    versions = get_versions([stale.pk])
+    amounts = {ingredient['id']: ingredient['amount'] for ingredient
+               in get_fragments(versions)[stale.pk]['ingredients']}
+    assert amounts[item.ingredient_id] == 999
+
+
+def test_search_keeps_page_number_pagination(anon_client, recipes):
+    response = anon_client.get(
+        '/api/recipes/?search=Рецепт&pagination=cursor')
+    assert response.status_code == 200
+    assert response.json()['count'] == len(recipes)
@@ -0,0 +1,75 @@
+from contextlib import suppress
+
+import pytest
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import NotFound
+
+from api.replicas import replica_state
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet
+from recipes.models import Tag
+
+
+@pytest.fixture
+def replica(transactional_db, settings):
+    """Вторая база данных - отдельное подключение к тестовой БД."""
+    connections.databases['replica'] = dict(
+        connections['default'].settings_dict)
+    settings.DATABASE_REPLICAS = ['replica']
+    yield connections['replica']
+    connections['replica'].close()
+    del connections['replica']
+    del connections.databases['replica']
+
+
+def capture(client, method, *args, **kwargs):
+    with CaptureQueriesContext(connections['default']) as default, \
+            CaptureQueriesContext(connections['replica']) as replica:
+        response = getattr(client, method)(*args, **kwargs)
+    return response, len(default), len(replica)
+
+
+def test_safe_reads_go_to_replica(replica, recipes, anon_client):
+    # Недостающие фрагменты всегда строятся по основной БД.
+    RecipeSerializer(recipes, many=True).data
+    response, default, reads = capture(anon_client, 'get', '/api/recipes/')
+    assert response.status_code == 200
+    assert default == 0
+    assert reads > 0
+    assert replica_state.get() is None
+
+
+def test_writes_go_to_default(replica, recipes, user_client):
+    response, default, reads = capture(
+        user_client, 'post', f'/api/recipes/{recipes[1].pk}/favorite/')
+    assert response.status_code == 201
+    assert default > 0
+    assert reads == 0
+
+
+def test_reads_after_write_go_to_default(replica, recipes, anon_client,
+                                         monkeypatch):
+    list_view = RecipeViewSet.list
+
+    def write_then_list(view, request, *args, **kwargs):
+        Tag.objects.create(name='Новый', color='#ABCDEF', slug='new')
+        return list_view(view, request, *args, **kwargs)
+
+    monkeypatch.setattr(RecipeViewSet, 'list', write_then_list)
+    response, default, reads = capture(anon_client, 'get', '/api/recipes/')
+    assert response.status_code == 200
+    assert default > 1
+    assert reads == 0
+
+
+@pytest.mark.parametrize('error', (NotFound, RuntimeError))
+def test_state_is_reset_when_view_raises(replica, anon_client, monkeypatch,
+                                         error):
+    def fail(view, request, *args, **kwargs):
+        raise error()
+
+    monkeypatch.setattr(RecipeViewSet, 'list', fail)
+    with suppress(RuntimeError):
+        anon_client.get('/api/recipes/')
+    assert replica_state.get() is None
@@ -1,20 +1,32 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 
+from foodgram.admin_tools import LargeTableAdminMixin
 from .models import Subscription, User
 
 
 class SubscriptionInline(admin.TabularInline):
     model = Subscription
     fk_name = 'user'
+    autocomplete_fields = ('author',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'author')
 
-class CustomUserAdmin(UserAdmin):
+
+class CustomUserAdmin(LargeTableAdminMixin, UserAdmin):
     list_display = ('username', 'email', 'first_name', 'last_name',
                     'is_staff')
-    list_filter = ('username', 'email')
+    list_filter = ('is_staff', 'is_superuser', 'is_active')
     inlines = (SubscriptionInline,)
 
 
+class SubscriptionAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'author')
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('^user__username', '^author__username')
+
+
 admin.site.register(User, CustomUserAdmin)
-admin.site.register(Subscription)
+admin.site.register(Subscription, SubscriptionAdmin)
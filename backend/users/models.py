@@ -3,8 +3,10 @@ from django.core.validators import RegexValidator
 from django.db import models
 from django.db.models import F, Q
 
+from foodgram.model_tools import CounterFieldsMixin
 
-class User(AbstractUser):
+
+class User(CounterFieldsMixin, AbstractUser):
     username = models.CharField(
         unique=True,
         max_length=150,
@@ -26,6 +28,17 @@ class User(AbstractUser):
         max_length=254,
         verbose_name='email aдрес'
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='рецептов',
+        default=0,
+        editable=False,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='подписчиков',
+        default=0,
+        editable=False,
+    )
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         ordering = ('username',)